@@ -1,39 +1,35 @@
 import csv
-import time
+import sys
 from multiprocessing import Process
+from afspeelklok import ReplayClock
 
-# Timestamp waarop het programma start (dit wordt het punt Time=0 in de files)
-start_time = time.time()
-
-def csv_file():
+def csv_file(clock):
     '''Lezen van het eerste CSV bestand'''
     filename='2__pressureandflow.xls'
     with open(filename) as file:
         reader = csv.reader(file, delimiter='\t')
         for row in reader:
-            current_time = time.time() - start_time
-            if current_time < float(row[0]):
-                # Wacht juiste tijd af
-                time.sleep(float(row[0]) - current_time)
+            # Wacht juiste tijd af
+            clock.sleep_until(float(row[0]))
             print(row)
 
-def csv_with_headers():
+def csv_with_headers(clock):
     '''Lezen van het tweede CSV bestand, met headers waaronder Time'''
     filename='2__monitordata.xls'
     with open(filename) as file:
         reader = csv.DictReader(file, delimiter='\t')
         for row in reader:
-            current_time = time.time() - start_time
-            if current_time < float(row['Time']):
-                # Wacht juiste tijd af
-                time.sleep(float(row['Time']) - current_time)
+            # Wacht juiste tijd af
+            clock.sleep_until(float(row['Time']))
             print(row)
 
 # Start als verschillende processen zodat ze tegelijk draaien
+# Optioneel de afspeelsnelheid, bijv. "python 2_1inladendata.py 4" speelt 4x zo snel af
 if __name__ == '__main__':
-    p1 = Process(target=csv_file)
+    clock = ReplayClock(speed=float(sys.argv[1]) if len(sys.argv) > 1 else 1) # Gedeelde klok; Time=0 in de files is nu
+    p1 = Process(target=csv_file, args=(clock,))
     p1.start()
-    p2 = Process(target=csv_with_headers)
+    p2 = Process(target=csv_with_headers, args=(clock,))
     p2.start()
     p1.join()
     p2.join()
@@ -1,65 +1,48 @@
-
 # Bron: https://www.geeksforgeeks.org/saving-a-video-using-opencv/
 
-# Python program to save a  
-# video using OpenCV 
-  
-   
-import cv2 
-  
-   
-# Create an object to read  
-# from camera 
-video = cv2.VideoCapture(0) 
-   
-# We need to check if camera 
-# is opened previously or not 
-if (video.isOpened() == False):  
-    print("Error reading video file") 
-  
-# We need to set resolutions. 
-# so, convert them from float to integer. 
-frame_width = int(video.get(3)) 
-frame_height = int(video.get(4)) 
-   
-size = (frame_width, frame_height) 
-   
-# Below VideoWriter object will create 
-# a frame of above defined The output  
-# is stored in 'filename.avi' file. 
-result = cv2.VideoWriter('filename.avi',  
-                         cv2.VideoWriter_fourcc(*'MJPG'), 
-                         10, size) 
-    
-while(True): 
-    ret, frame = video.read() 
-  
-    if ret == True:  
-  
-        # Write the frame into the 
-        # file 'filename.avi' 
-        result.write(frame) 
-  
-        # Display the frame 
-        # saved in the file 
-        cv2.imshow('Frame', frame) 
-  
-        # Press S on keyboard  
-        # to stop the process 
-        if cv2.waitKey(1) & 0xFF == ord('s'): 
-            break
-  
-    # Break the loop 
-    else: 
+# Webcam opnemen naar 'filename.avi', met een voorbeeld in beeld. Opnemen, wegschrijven en het voorbeeld lopen elk
+# in een eigen thread (zie opname.Recorder), zodat een trage encoder of een druk scherm de camera niet ophoudt.
+# De tijd van elk frame komt in 'filename.frames.xls' (voor het gelijk afspelen met de monitordata), en na het stoppen
+# de index met tijden en keyframes in 'filename.frames.ses' (om snel naar elk moment te kunnen zoeken, zie videoindex.py).
+
+import sys
+import time
+import cv2
+from opname import Recorder
+from videoindex import index_file
+
+# Camera (nummer) of een videobestand als bron; --source om te kiezen
+source = sys.argv[sys.argv.index('--source') + 1] if '--source' in sys.argv else '0'
+source = int(source) if source.isdigit() else source
+filename = sys.argv[sys.argv.index('--output') + 1] if '--output' in sys.argv else 'filename.avi'
+
+recorder = Recorder(filename, source)
+try:
+    recorder.start()
+except OSError as error:
+    print(error)
+    sys.exit(1)
+
+while recorder.running:
+    # Display the frame (alleen het nieuwste; als het scherm achterloopt worden frames overgeslagen, niet de opname)
+    frame = recorder.preview_frame()
+    if frame is not None:
+        cv2.imshow('Frame', frame)
+
+    # Press S on keyboard
+    # to stop the process
+    if cv2.waitKey(1) & 0xFF == ord('s'):
         break
-  
-# When everything done, release  
-# the video capture and video  
-# write objects 
-video.release() 
-result.release() 
-    
-# Closes all the frames 
-cv2.destroyAllWindows() 
-   
-print("The video was successfully saved") 
\ No newline at end of file
+    if frame is None:
+        time.sleep(0.005)
+
+# Wacht tot alles wat al opgenomen is weggeschreven is
+recorder.stop()
+
+# Closes all the frames
+cv2.destroyAllWindows()
+
+print("The video was successfully saved")
+stats = recorder.stats()
+print(f"{stats['written']} van {stats['captured']} frames opgeslagen ({stats['dropped']} overgeslagen, grootste achterstand "
+      f"{stats['max_backlog']} frames), {stats['real_fps']:.1f} fps; index in {index_file(filename)}")
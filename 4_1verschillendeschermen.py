@@ -1,68 +1,126 @@
+import sys
+import matplotlib as mpl
+headless = '--headless' in sys.argv # Zonder venster tekenen (Agg); moet gekozen worden voor pyplot geladen wordt
+if headless:
+    mpl.use('Agg')
 import matplotlib.pyplot as plt
 import numpy as np
-import matplotlib as mpl
-from pathlib import Path
 import csv
 import time
-from multiprocessing import Process, Manager
-from matplotlib.animation import FuncAnimation
+import threading
+from multiprocessing import Process
 from matplotlib.widgets import Button
+from datalezer import read_headers
+from sessiebestand import open_tail
+from ringbuffer import SampleRing
+from tekenlus import Scheduler
+from geschiedenis import TieredHistory
+from ademhaling import BreathDetector, breath_channels
+from alarmen import AlarmRule, AlarmEngine
+from afspeelklok import ReplayClock
+from meting import Metrics
+from indeling import Layout
+from schermen import Screens
+from lettertypen import font
+from lijnen import LiveLine, LiveBand, Sparkline
+from zonderscherm import Offscreen
 
 # Geen toolbar 
 mpl.rcParams['toolbar'] = 'None'
 
-# Lettertype inladen uit bestand (drie verschillende stijlen; overeenkomend met ontwerp)
-montserrat = Path('Montserrat-Regular.ttf')
-montserrat_medium = Path('Montserrat-Medium.ttf')
-montserrat_bold = Path('Montserrat-Bold.ttf')
+# Lettertype inladen uit bestand (drie verschillende stijlen; overeenkomend met ontwerp), één keer voor alle teksten
+montserrat = font('regular')
+montserrat_medium = font('medium')
+montserrat_bold = font('bold')
 
-# Pixel breedte/hoogte van het scherm (rekent makkelijker dan getallen tussen 0 en 1)
+# Pixel breedte/hoogte van het ontwerp (rekent makkelijker dan getallen tussen 0 en 1)
 xscale = 2560
 yscale = 1440
 
+# Indeling van het scherm in pixels van het ontwerp: vakken (x, y vanaf linksboven, breedte, hoogte) en punten (x, y)
+screen_layout = {
+    'blok1': (43, 43, 2475, 816), # Bovenaan
+    'blok2': (43, 911, 1211, 491), # Linksonder
+    'blok3': (1307, 911, 1211, 491), # Rechtsonder
+    'druk': (469, 43, 2049, 272),
+    'druk_labels': (43, 43),
+    'flow': (469, 315, 2049, 272),
+    'flow_labels': (43, 315),
+    'volume': (469, 587, 2049, 272),
+    'volume_labels': (43, 587),
+    'fio2_labels': (43, 911),
+    'spo2_labels': (43, 1183),
+    'spo2': (414, 911, 750, 300),
+    'blok2_onder': (414, 1261, 750, 100),
+    'pulse_labels': (1307, 911),
+    'leak_labels': (1307, 1183),
+    'pulse': (1557, 1011, 160, 80),
+    'leak': (1557, 1283, 160, 80),
+    'timer': (1307, 911),
+    'reset': (1795, 1248, 245, 112),
+    'stop': (2093, 1248, 245, 112),
+    'metingen': (2518, 30),
+}
+
 # Genereer een "figure" en stel wat algemene dingen in
 fig = plt.figure(figsize=(16, 9)) # 16:9 ratio (xscale: yscale)
-window_scale = 1 # Voor evt. volgende iteratie: Dit baseren op feitelijke schermgrootte
+layout = Layout(fig, screen_layout, xscale, yscale) # Rekent het ontwerp om naar de feitelijke schermgrootte (en DPI)
+fig.canvas.mpl_connect('resize_event', layout.apply) # Andere schermgrootte: alleen posities en groottes aanpassen (vóór de Scheduler, die daarna de achtergrond opnieuw maakt)
 line_width = 1.5
 border_color = '#e4e7f0'
 line_color = '#a6a6a6'
 
-# Timestamp waarop het programma start (dit wordt het punt Time=0 in de files)
-start_time = time.time()
-refresh_time = 100 # Laad nieuwe data elke zo veel milliseconden
-
-# Animaties en buttons werken alleen vanuit een global
-animations = []
+# Bestanden met de opname (druk/flow met 25 samples per seconde, monitordata met 1 rij per seconde)
+pressure_file = '2__pressureandflow.xls'
+monitor_file = '2__monitordata.xls'
+
+# Klok voor het afspelen; start nu op het punt Time=0 in de files (pauze, snelheid en zoeken via het toetsenbord)
+clock = ReplayClock()
+seek_history = 60 # Seconden data die na een sprong in de tijd alvast geladen worden
+refresh_time = 40 # Laad nieuwe data en teken een nieuw frame elke zo veel milliseconden (25 Hz)
+history_seconds = 10 * 60 # Seconden druk/flow met alle samples in het geheugen (ouder: min/max/gemiddelde per seconde)
+history_max_bytes = 32 << 20 # Maximaal geheugen voor de druk/flow geschiedenis (32 MB is ongeveer 56 uur bij buckets van 1 seconde)
+history_spill = sys.argv[sys.argv.index('--spill') + 1] if '--spill' in sys.argv else None # Optioneel: alle samples ook naar dit bestand
+monitor_buffer_size = 2 * 60 * 60 # Aantal rijen monitordata dat bewaard wordt (ongeveer 2 uur bij 1 rij per seconde)
+breath_buffer_size = 2 * 60 * 60 # Aantal ademhalingen dat bewaard wordt (PIP, PEEP, frequentie, Vti, Vte)
+alarm_buffer_size = 60 * 60 # Aantal keer dat een alarm aan of uit ging dat bewaard wordt
+alarm_color = '#ff0000' # Kleur van een label met een actief alarm
+# Grenzen uit de monitordata: naam, kanaal, grens (kanaal of getal), richting, hysterese, debounce (s), label op het scherm
+# (alleen labels met monitordata kleuren mee; PIP/PEEP/Vte op het scherm komen uit de ademhalingen, niet van de monitor)
+alarm_rules = [
+    AlarmRule('PIP hoog', 'PIP', 'Max PIP Limit', 'high', 1, 2),
+    AlarmRule('PEEP laag', 'PEEP', 'Min PEEP Limit', 'low', 0.5, 2),
+    AlarmRule('Vte hoog', 'Vte', 'Vte High Limit', 'high', 1, 5),
+    AlarmRule('Vte laag', 'Vte', 'Vte Low Limit', 'low', 1, 5),
+    AlarmRule('SpO2 hoog', 'SpO2', 'SpO2 High Target', 'high', 1, 10),
+    AlarmRule('SpO2 laag', 'SpO2', 'SpO2 Low Target', 'low', 1, 10),
+    AlarmRule('Leak hoog', 'Leak', 'Leak Limit', 'high', 2, 5),
+    AlarmRule('Pulse laag', 'Pulse', 'Pulse Low Alarm', 'low', 5, 5),
+]
+ingest_mode = 'thread' if '--thread' in sys.argv else 'process' # Inlezen in een apart proces, of met --thread in een thread
+time_windows = [10, 60, None] # Zichtbare tijd in de bovenste grafieken in seconden (None = hele sessie); wisselen met "w"
+time_window = 0 # Huidige keuze uit time_windows
+target_window = 10 * 60 # Zichtbare tijd in de SpO2 grafiek met doelbereik in seconden
+sparkline_points = 120 # Aantal waardes in de kleine grafieken in blok 3 (2 minuten bij 1 rij monitordata per seconde)
+metrics_file = sys.argv[sys.argv.index('--metrics') + 1] if '--metrics' in sys.argv else None # Metingen opslaan (.csv of .json)
+show_metrics = False # Metingen op het scherm tonen; wisselen met "m"
+headless_output = sys.argv[sys.argv.index('--output') + 1] if '--output' in sys.argv else None # Zonder venster: map voor PNG's of een .rgba bestand
+headless_fps = float(sys.argv[sys.argv.index('--fps') + 1]) if '--fps' in sys.argv else 1000 / refresh_time # Zonder venster: frames per seconde
+headless_duration = float(sys.argv[sys.argv.index('--duration') + 1]) if '--duration' in sys.argv else None # Zonder venster: stoppen na zo veel seconden
+
+# Eén timer voor alle animaties (tekent alleen wat veranderd is), met metingen van vertraging en teken-tijd;
+# buttons werken alleen vanuit een global
+metrics = Metrics(refresh_time, clock, enabled=metrics_file is not None) # Alleen meten als erom gevraagd wordt (--metrics of "m")
+scheduler = Scheduler(fig, refresh_time, metrics=metrics)
+screens = Screens(fig, scheduler) # Elk scherm wordt één keer opgebouwd; wisselen zet alleen de zichtbaarheid om
 buttons = []
+value_labels = {} # Kanaalnaam -> label met de live waarde uit de monitordata (voor het kleuren bij een alarm)
 current_screen = 0 # Test voor wisselen tussen schermen
-
-def xy_float(x, y):
-    '''Converteer X/Y waarde in pixels om naar float values (0-1)'''
-    x /= xscale
-    y = yscale - y # Y is verkeerd om in Matplotlib
-    y /= yscale
-    return (x, y)
-
-def w_float(w):
-    '''Breedte van pixels naar float values (0-1)'''
-    return w / xscale
-
-def h_float(h):
-    '''Hoogte van pixels naar float values (0-1)'''
-    return h / yscale
-
-def xywh_float(x, y, w, h):
-    '''X, Y, breedte, hoogte naar float values (0-1)'''
-    result = list(xy_float(x, y))
-    result[1] -= h_float(h) # Y is verkeerd om in Matplotlib
-    result.append(w_float(w))
-    result.append(h_float(h))
-    return result
-
+screen_count = 4 # 0 = normaal, 1-3 = extra (test)schermen
 
 def bg_block(*args):
     '''Teken een achtergrondblok'''
-    ax = fig.add_axes(xywh_float(*args))
+    ax = layout.add_axes(*args)
     ax.xaxis.set_tick_params(labelbottom=False)
     ax.yaxis.set_tick_params(labelleft=False)
     ax.spines['bottom'].set_color(border_color)
@@ -77,7 +135,7 @@ def bg_block(*args):
 
 def graph(*args):
     '''Teken een simpele grafiek'''
-    ax = fig.add_axes(xywh_float(*args))
+    ax = layout.add_axes(*args)
     ax.xaxis.set_tick_params(labelbottom=False, length=0)
     ax.yaxis.set_tick_params(labelleft=False, length=0)
     ax.margins(x=0, y=0.05)
@@ -86,33 +144,45 @@ def graph(*args):
 
 def block1_graph(x, y, w, h, csv, csv_col, color='#000000', lines=[]):
     '''Lijngrafiek met "blok 1" (bovenaan) grafieken met x en y waardes, kleur en een lijst van referentielijnen'''
-    global animations
-    timescale = 600
     ax = graph(x, y, w, h)
     ax.yaxis.set_tick_params(labelleft=True, length=0)
     ax.spines['left'].set_color(border_color)
     ax.spines['right'].set_visible(False)
     ax.spines['top'].set_visible(False)
     ax.spines['bottom'].set_visible(False)
-    ax.set_xlim(0, timescale)
+    ax.set_xlim(0, 1) # X-as is het zichtbare tijdvenster (0 = begin, 1 = nu), zodat de achtergrond niet verandert
     ax.set_ylim(-5, 30)
     reflines = []
     for l in lines: # Referentielijnen
-        refline, = ax.plot([0, timescale], [l, l], color=line_color, linewidth=2*window_scale)
-        reflines.append(refline)
+        refline, = ax.plot([0, 1], [l, l], color=line_color)
+        reflines.append(layout.linewidth(refline, 2))
     ax.set_yticks(lines)
     ax.set_yticklabels(lines, font=montserrat_bold, color=line_color)
-    line, = ax.plot([], [], color=color, linewidth=3*window_scale)
+    line, = ax.plot([], [], color=color)
+    layout.linewidth(line, 3)
+    last_version = None
+    last_window = -1
 
     def update(_):
-        if len(csv) == 0:
-            return line,
-        xvalues = csv[0]
-        yvalues = csv[csv_col]
-        line.set_data(xvalues, yvalues)
-        return line,
-
-    animations.append(FuncAnimation(fig, update, interval=refresh_time, save_count=1))
+        nonlocal last_version, last_window
+        now = clock.now()
+        span = time_windows[time_window]
+        if span is None:
+            # Hele sessie; alleen opnieuw tekenen als er nieuwe data is
+            if csv.version == last_version and time_window == last_window:
+                return []
+            begin = 0
+            span = max(now, 1)
+        else:
+            # Schuivend venster; elk frame opnieuw tekenen
+            begin = now - span
+        last_version = csv.version
+        last_window = time_window
+        data = csv.query(begin, now, span / ax.bbox.width) # Alleen het zichtbare deel, max. 2 punten per pixel
+        line.set_data((data[:, 0] - begin) / span, data[:, csv_col])
+        return [line]
+
+    scheduler.add(update, [line])
     fig.add_axes(ax)
     fig.add_axes(ax)
     return ax
@@ -128,7 +198,7 @@ def block2_graph(x, y, w, h, xvalues, yvalues, color='#000000', extrayvalues=[])
     rightlabels = []
     for extray in extrayvalues:
         ax.yaxis.set_tick_params(labelleft=True, length=0)
-        ax.plot(xvalues, extray, color=line_color, linewidth=3*window_scale)
+        layout.linewidth(ax.plot(xvalues, extray, color=line_color)[0], 3)
         # Toon zowel links als rechts de eerste resp. laatste Y-waarde van de referentielijnen
         leftlabels.append(int(extray.flat[0]))
         rightlabels.append(int(extray.flat[-1]))
@@ -145,70 +215,232 @@ def block2_graph(x, y, w, h, xvalues, yvalues, color='#000000', extrayvalues=[])
         twin_ax.spines['right'].set_visible(False)
         twin_ax.spines['top'].set_visible(False)
         twin_ax.spines['bottom'].set_visible(False)
-    ax.plot(xvalues, yvalues, color=color, linewidth=3*window_scale)
+    layout.linewidth(ax.plot(xvalues, yvalues, color=color)[0], 3)
     fig.add_axes(ax)
     return ax
 
 
-def block3_graph(x, y, w, h, xvalues, yvalues, color='#000000'):
-    '''Lijngrafiek met "blok 2" (rechtsonder) grafieken met x en y waardes en een kleur'''
+def block2_target_graph(x, y, w, h, source, channel, low, high, color='#000000'):
+    '''Lijngrafiek in blok 2 met de live waardes van een kanaal en het doelbereik (vlak tussen de kanalen low en high)
+
+    Nieuwe rijen worden alleen achteraan toegevoegd (LiveLine, LiveBand); het schuiven in de tijd gaat met de x-as, zodat
+    er niets opnieuw opgebouwd wordt. Waardes en grenzen van 0 betekenen "geen meting" en worden niet getekend.
+    '''
     ax = graph(x, y, w, h)
+    ax.yaxis.set_tick_params(labelleft=True, length=0)
     ax.spines['left'].set_visible(False)
     ax.spines['right'].set_visible(False)
     ax.spines['top'].set_visible(False)
     ax.spines['bottom'].set_visible(False)
-    ax.plot(xvalues, yvalues, color=color, linewidth=2*window_scale)
+    ax.set_xlim(0, target_window) # X-as is sessietijd; schuift mee zodra het venster vol is
+    ax.set_ylim(30, 102) # Iets ruimte boven 100%, zodat de lijn daar niet half weggeknipt wordt
+    ax.set_yticks([40, 60, 80, 100])
+    ax.set_yticklabels([40, 60, 80, 100], font=montserrat_bold, color=line_color)
+    capacity = 2 * target_window # Rijen (monitordata heeft 1 rij per seconde)
+    band = LiveBand(ax, capacity, facecolor=color, alpha=0.15, edgecolor='none')
+    line, = ax.plot([], [], color=color)
+    layout.linewidth(line, 3)
+    values = LiveLine(line, capacity)
+    columns = [source.index[channel], source.index[low], source.index[high]]
+    last_epoch = None
+    last_count = 0
+
+    def update(_):
+        nonlocal last_epoch, last_count
+        dirty = []
+        now = clock.now()
+        begin = max(now - target_window, 0)
+        if source.epoch != last_epoch:
+            # Nieuw begin (of gezocht in de tijd): opnieuw vullen vanaf het begin van het venster
+            values.clear()
+            band.clear()
+            rows = source.window(begin, None)
+            dirty = [band.patch, line]
+        else:
+            rows = source.last(min(source.count - last_count, capacity)) if source.count > last_count else source.last(0)
+        last_epoch, last_count = source.epoch, source.count
+        if len(rows) > 0:
+            data = rows[:, columns]
+            data = np.where(data > 0, data, np.nan)
+            values.append(rows[:, 0], data[:, 0], begin)
+            band.append(rows[:, 0], data[:, 1], data[:, 2], begin)
+            dirty = [band.patch, line]
+        if abs(ax.get_xlim()[0] - begin) >= target_window / ax.bbox.width:
+            # Minstens een pixel verder: x-as opschuiven (de achtergrond hangt daar niet van af)
+            ax.set_xlim(begin, begin + target_window)
+            dirty = [band.patch, line]
+        return dirty
+
+    scheduler.add(update, [band.patch, line])
     fig.add_axes(ax)
     return ax
 
 
-def block1_labels(x, y, title, color='#000000', values={}):
-    '''Teken titel en labels bij een grafiek in blok 1 (bovenaan)'''
+def block3_graph(x, y, w, h, source, channel, color='#000000'):
+    '''Kleine trendlijn (sparkline) in blok 3 (rechtsonder) met de laatste waardes van een kanaal (0 = geen meting)'''
+    ax = graph(x, y, w, h)
+    ax.spines['left'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.spines['top'].set_visible(False)
+    ax.spines['bottom'].set_visible(False)
+    sparkline = Sparkline(ax, sparkline_points, color=color)
+    layout.linewidth(sparkline.line, 2)
+    column = source.index[channel]
+    last_epoch = None
+    last_count = 0
+
+    def update(_):
+        nonlocal last_epoch, last_count
+        if source.epoch == last_epoch and source.count == last_count:
+            return []
+        if source.epoch != last_epoch:
+            sparkline.clear()
+            rows = source.last(sparkline_points)
+        else:
+            rows = source.last(min(source.count - last_count, sparkline_points))
+        last_epoch, last_count = source.epoch, source.count
+        values = rows[:, column]
+        sparkline.push(np.where(values > 0, values, np.nan))
+        return [sparkline.line]
+
+    scheduler.add(update, [sparkline.line])
+    fig.add_axes(ax)
+    return ax
+
+
+def readout_values(unit=''):
+    '''Teksten die een label met live waardes meestal toont (worden alvast gerenderd)'''
+    return ['--'] + [f'{value}{unit}' for value in range(1, 101)]
+
+
+def live_label(label, source, channel, unit=''):
+    '''Laat een label de laatste waarde van een kanaal tonen, of -- zonder meting (alleen opnieuw tekenen als de getoonde waarde verandert)'''
+    column = source.index[channel]
+    last_version = None
+
+    def update(_):
+        nonlocal last_version
+        if source.version == last_version:
+            return []
+        last_version = source.version
+        data = source.last(1)
+        value = data[0, column] if len(data) > 0 else np.nan
+        text = '--' if not value > 0 else f'{value:.0f}{unit}' # 0 of NaN: geen meting
+        if text == label.get_text():
+            return []
+        label.set_text(text)
+        return [label]
+
+    scheduler.add(update, [label])
+
+
+def alarm_labels(alarms):
+    '''Kleur de labels met een actief alarm rood (alleen de labels waarvan het alarm aan of uit gaat worden opnieuw getekend)'''
+    labels = {rule.label: value_labels[rule.label] for rule in alarm_rules if rule.label in value_labels}
+    colors = {name: label.get_color() for name, label in labels.items()} # Normale kleur
+    rules = [(i + 1, rule.label) for i, rule in enumerate(alarm_rules) if rule.label in labels] # Kolom in alarms, label
+    last_version = None
+
+    def update(_):
+        nonlocal last_version
+        if alarms.version == last_version:
+            return []
+        last_version = alarms.version
+        state = alarms.last(1)
+        active = {name for column, name in rules if len(state) > 0 and state[0, column] > 0}
+        dirty = []
+        for name, label in labels.items():
+            color = alarm_color if name in active else colors[name]
+            if label.get_color() != color:
+                label.set_color(color)
+                dirty.append(label)
+        return dirty
+
+    scheduler.add(update, []) # De labels zelf zijn al geregistreerd door live_label()
+
+
+def block1_labels(x, y, title, color='#000000', values={}, source=None):
+    '''Teken titel en labels bij een grafiek in blok 1 (bovenaan); met source zijn de values kanaalnamen (live waardes)'''
     labels = []
-    labels.append(fig.text(*xy_float(x + 50, y + 70), title, fontsize=18*window_scale, font=montserrat, color=color))
-    dy = 0
+    labels.append(layout.text(x + 50, y + 70, title, 18, cached=True, font=montserrat, color=color))
+    dx = 0 # Meerdere labels naast elkaar onderin (boven elkaar komen ze tegen een lange titel aan)
     for label in values:
-        labels.append(fig.text(*xy_float(x + 220, y + 180 - dy), label, fontsize=12*window_scale, font=montserrat, color=color))
-        labels.append(fig.text(*xy_float(x + 220, y + 240 - dy), values[label], fontsize=28*window_scale, font=montserrat_medium, color=color))
-        dy += 120
+        labels.append(layout.text(x + 220 + dx, y + 180, label, 12, cached=True, font=montserrat, color=color))
+        labels.append(layout.text(x + 220 + dx, y + 240, '--' if source is not None else values[label], 28, cached=True, warm=readout_values() if source is not None else (), font=montserrat_medium, color=color))
+        if source is not None:
+            live_label(labels[-1], source, values[label])
+        dx += 100
     return labels
 
 
-def block2_labels(x, y, title, value, color='#000000'):
-    '''Teken titel en labels bij een grafiek in blok 2 en 3 (links- en rechtsonder)'''
+def block2_labels(x, y, title, value, color='#000000', source=None, unit=''):
+    '''Teken titel en labels bij een grafiek in blok 2 en 3 (links- en rechtsonder); met source is value een kanaalnaam'''
     labels = []
-    labels.append(fig.text(*xy_float(x + 50, y + 70), title, fontsize=18*window_scale, font=montserrat, color=color))
-    labels.append(fig.text(*xy_float(x + 50, y + 170), value, fontsize=40*window_scale, font=montserrat_medium, color=color))
+    labels.append(layout.text(x + 50, y + 70, title, 18, cached=True, font=montserrat, color=color))
+    labels.append(layout.text(x + 50, y + 170, '--' if source is not None else value, 40, cached=True, warm=readout_values(unit) if source is not None else (), font=montserrat_medium, color=color))
+    if source is not None:
+        live_label(labels[-1], source, value, unit)
+        value_labels[value] = labels[-1] # Monitordata: de alarmen gaan over deze kanalen
     return labels
 
 
 def block3_timer(x, y, color='#000000'):
     '''Teken groot label voor in blok 3 (rechtsonder)'''
     labels = []
-    label = fig.text(*xy_float(x + 750, y + 200), '--:--', fontsize=80*window_scale, font=montserrat_medium, color=color, horizontalalignment='center', verticalalignment='center')
+    label = layout.text(x + 750, y + 200, '--:--', 80, cached=True, font=montserrat_medium, color=color, horizontalalignment='center', verticalalignment='center')
     labels.append(label)
+    warmed_minute = None
 
     def update(_):
-        now = time.time() - start_time
+        nonlocal warmed_minute
+        now = clock.now()
+        if int(now) // 60 != warmed_minute:
+            # Alvast de tijden van deze en de volgende minuut renderen (in een thread)
+            minutes = (int(now) // 60, int(now) // 60 + 1)
+            if label.prewarm([f'{minute:02d}:{second:02d}' for minute in minutes for second in range(60)]):
+                warmed_minute = int(now) // 60
         min = int(now) // 60
         sec = int(now) % 60
         if min < 10: min = f'0{min}'
         if sec < 10: sec = f'0{sec}'
+        if label.get_text() == f'{min}:{sec}':
+            return []
         label.set_text(f'{min}:{sec}')
+        return [label]
 
-    animations.append(FuncAnimation(fig, update, interval=refresh_time, save_count=1))
+    scheduler.add(update, [label])
     return labels
 
 
+def metrics_overlay():
+    '''Teken (verborgen) label rechtsboven met de metingen: teken-tijd, vertraging, gemiste frames en achterstand'''
+    label = layout.text(*layout['metingen'], '', 10, font=montserrat, color=line_color, horizontalalignment='right', visible=False)
+    last_update = 0
+
+    def update(_):
+        nonlocal last_update
+        if label.get_visible() != show_metrics:
+            label.set_visible(show_metrics)
+            return [label]
+        if not show_metrics or time.time() - last_update < 0.5:
+            return []
+        last_update = time.time()
+        label.set_text(metrics.text())
+        return [label]
+
+    scheduler.add(update, [label])
+    return label
+
+
 def button(x, y, w, h, title, onclick=None):
     '''Teken een knop'''
     global buttons
     ax = bg_block(x, y, w, h)
     btn = Button(ax, title, color='#FFFFFF')
     btn.label.set_font_properties(montserrat)
-    btn.label.set_fontsize(28*window_scale)
+    layout.fontsize(btn.label, 28)
     btn.on_clicked(onclick)
-    buttons.append(btn)
+    buttons.append(screens.widget(btn))
     fig.add_axes(ax)
 
 
@@ -236,123 +468,218 @@ def csv_file(filename, delimiter='\t', time_col=0, start=0, end=-1):
     return result
 
 
-def csv_load_data(csv_data):
-    '''Laad CSV data uit bestand (constant)'''
-    filename='2__pressureandflow.xls'
-    while True:
-        last_time = csv_data[0][-1] if len(csv_data) > 0 and len(csv_data[0]) > 0 else float(0)
-        current_time = time.time() - start_time
-        data = csv_file(filename, start=last_time, end=current_time)
-        for row in data:
-            # Split the data to the appropriate lists (by column)
-            for i in range(0, len(row)):
-                while len(csv_data) <= i:
-                    csv_data.append([])
-                l = csv_data[i]
-                try:
-                    v = float(row[i])
-                except ValueError:
-                    v = None
-                l.append(v)
-                csv_data[i] = l
+def csv_load_data(csv_data, monitor_data, breath_data, alarm_data, clock, stop=None):
+    '''Laad CSV data uit bestanden (constant, of tot stop gezet is): druk/flow (met volume en ademhalingen) en de monitordata (met alarmen), volgens de afspeelklok'''
+    # Onthoudt tot waar het bestand al gelezen is; een opname die omgezet is (python sessiebestand.py ...) via mmap
+    tail = open_tail(pressure_file)
+    monitor_tail = open_tail(monitor_file, time_col='Time')
+    detector = BreathDetector() # Ademhalingen uit de flow, steeds alleen over de nieuwe samples
+    engine = AlarmEngine(alarm_rules, monitor_data.names) # Grenzen controleren, ook alleen over de nieuwe rijen
+    seeks = clock.seeks
+    while stop is None or not stop.is_set():
+        if clock.seeks != seeks:
+            # Er is in de tijd gesprongen: buffers leegmaken en vanaf het nieuwe punt (met wat geschiedenis) verder lezen
+            seeks = clock.seeks
+            begin = max(clock.now() - seek_history, 0)
+            tail.seek(begin)
+            monitor_tail.seek(begin)
+            csv_data.reset()
+            monitor_data.reset()
+            breath_data.reset()
+            alarm_data.reset()
+            detector.reset()
+            engine.reset()
+        current_time = clock.now()
+        data = tail.read_array(end=current_time) # Alle nieuwe rijen in één keer als floats (ongeldige waardes zijn NaN)
+        if len(data) > 0:
+            data, breaths = detector.process(data)
+            csv_data.append(data)
+            if len(breaths) > 0:
+                breath_data.append(breaths)
+        data = monitor_tail.read_array(end=current_time)
+        if len(data) > 0:
+            monitor_data.append(data)
+            events = engine.process(monitor_data.last(len(data))) # Zelfde kolommen als in de buffer
+            if len(events) > 0:
+                alarm_data.append(events)
         # if len(data) > 0:
         #     print('CSV: ', len(data), 'new rows')
         time.sleep(refresh_time / 1000)
 
 
+def create_buffers(shared=True):
+    '''Buffers voor de druk/flow (geschiedenis in lagen, begrensd geheugen), de monitordata, de ademhalingen en de alarmen (ringbuffers)'''
+    csv_data = TieredHistory.create(4, 25, history_seconds, max_bytes=history_max_bytes, spill=history_spill, shared=shared) # Tijd, druk, flow, volume
+    monitor_data = SampleRing.create(monitor_buffer_size, read_headers(monitor_file), shared=shared) # Alle kolommen van de monitor
+    breath_data = SampleRing.create(breath_buffer_size, breath_channels, shared=shared) # Eén rij per ademhaling
+    alarm_data = SampleRing.create(alarm_buffer_size, ['Time'] + [rule.name for rule in alarm_rules], shared=shared) # Rij per verandering
+    return csv_data, monitor_data, breath_data, alarm_data
+
+
+def start_loader(mode='process'):
+    '''Start het inlezen in een apart proces (gedeeld geheugen) of in een thread in dit proces (buffers met lock)'''
+    shared = mode == 'process'
+    buffers = create_buffers(shared)
+    if shared:
+        loader = Process(target=csv_load_data, args=(*buffers, clock))
+    else:
+        stop = threading.Event()
+        loader = threading.Thread(target=csv_load_data, args=(*buffers, clock, stop), daemon=True)
+        loader.stop = stop
+    loader.start()
+    return (*buffers, loader)
+
+
+def stop_loader(loader, *buffers):
+    '''Stop het inlezen en ruim de buffers op'''
+    if type(loader) == Process:
+        loader.kill()
+    else:
+        loader.stop.set()
+    loader.join()
+    for buffer in buffers:
+        buffer.close()
+
+
 def click_reset(event):
     '''Klik op de "Reset" knop (wissel naar ander scherm)'''
-    global current_screen, animations, buttons
+    global current_screen
     print('RESET (volgende scherm)')
     current_screen += 1
-    current_screen %= 4 # Er zijn 3 extra schermen (0 = normaal, 1-3 = extra)
-    animations = []
-    buttons = []
-    fig.clear()
-    draw_graphs(csv_data, current_screen)
+    current_screen %= screen_count
+    screens.show(current_screen)
 
 
 def click_stop(event):
     '''Klik op de "Stop" knop (afsluiten)'''
     print('STOP')
     plt.close()
-    p1.kill()
+    stop_loader(p1, csv_data, monitor_data, breath_data, alarm_data)
+    if metrics_file:
+        metrics.dump(metrics_file)
     exit()
 
 
-def draw_graphs(csv, screen = 0):
-    '''Teken alle grafieken'''
-
-    # Test voor wisselen tussen schermen
-    if screen > 0:
-        button(screen * 200, screen * 200, xscale - screen * 400, yscale - screen * 400, f'Dit is scherm {screen}, klik hier voor de volgende', click_reset)
-        plt.show()
-        return
-
-    # "Druk" grafiek
-    block1_graph(469, 43, 2049, 272, csv, 1, '#f30170', [25])
-    block1_labels(43, 43, 'Druk', '#f30170', {'PEEP': 7, 'PIP': 26})
+def key_press(event):
+    '''Toetsenbord: "m" toont de metingen, "w" wisselt het tijdvenster, spatie pauzeert, links/rechts zoekt 10 seconden, omhoog/omlaag past de snelheid aan'''
+    global time_window, show_metrics
+    if event.key == 'm':
+        show_metrics = not show_metrics
+        if not metrics.enabled:
+            metrics.enable()
+    elif event.key == 'w':
+        time_window = (time_window + 1) % len(time_windows)
+        print('Tijdvenster:', time_windows[time_window] or 'hele sessie')
+    elif event.key == ' ':
+        clock.toggle()
+        print('Pauze' if clock.paused else 'Afspelen')
+    elif event.key in ('left', 'right'):
+        clock.step(10 if event.key == 'right' else -10)
+        print('Tijd:', round(clock.now()))
+    elif event.key in ('up', 'down'):
+        clock.set_speed(min(clock.speed * 2, 32) if event.key == 'up' else max(clock.speed / 2, 0.25))
+        print('Snelheid:', clock.speed)
+
+
+def draw_test_screen(screen):
+    '''Teken een extra scherm (test voor wisselen tussen schermen)'''
+    button(screen * 200, screen * 200, xscale - screen * 400, yscale - screen * 400, f'Dit is scherm {screen}, klik hier voor de volgende', click_reset)
+
+
+def draw_dashboard(csv, monitor, breaths, alarms):
+    '''Teken alle grafieken van het normale scherm'''
+    value_labels.clear()
+
+    # "Druk" grafiek (waardes per ademhaling, berekend uit druk/flow)
+    block1_graph(*layout['druk'], csv, 1, '#f30170', [25])
+    block1_labels(*layout['druk_labels'], 'Druk', '#f30170', {'PEEP': 'PEEP', 'PIP': 'PIP'}, breaths)
 
     # "Flow" grafiek
-    block1_graph(469, 315, 2049, 272, csv, 2, '#000000', [0])
-    block1_labels(43, 315, 'Flow', '#000000', {'Resp': 56})
+    block1_graph(*layout['flow'], csv, 2, '#000000', [0])
+    block1_labels(*layout['flow_labels'], 'Flow', '#000000', {'Resp': 'RR'}, breaths)
 
-    # "Terugvolume" grafiek
-    block1_graph(469, 587, 2049, 272, csv, 2, '#0c2074', [4, 8])
-    block1_labels(43, 587, 'Terugvolume', '#0c2074', {'Vti': 11})
+    # "Terugvolume" grafiek (geïntegreerde flow per ademhaling)
+    block1_graph(*layout['volume'], csv, 3, '#0c2074', [4, 8])
+    block1_labels(*layout['volume_labels'], 'Terugvolume', '#0c2074', {'Vte': 'Vte', 'Vti': 'Vti'}, breaths)
     
     # FiO2 / SpO2 labels
-    block2_labels(43, 911, 'FiO2', '21%', '#7000ff')
-    block2_labels(43, 1183, 'SpO2', '84%', '#00a5da')
+    block2_labels(*layout['fio2_labels'], 'FiO2', 'FiO2', '#7000ff', monitor, '%')
+    block2_labels(*layout['spo2_labels'], 'SpO2', 'SpO2', '#00a5da', monitor, '%')
 
-    # Blok 2 grafiek 1 (SpO2?)
-    x = np.linspace(0, 20, 300)
-    y = np.sqrt(x) * 10 + 40
-    ymin = np.sqrt(x) * 5 + 20
-    ymax = np.sqrt(x) * 15 + 60
-    block2_graph(414, 911, 750, 300, x, y, '#00a5da', [ymin, ymax])
+    # Blok 2 grafiek 1: SpO2 met het doelbereik (SpO2 Low/High Target) uit de monitordata
+    block2_target_graph(*layout['spo2'], monitor, 'SpO2', 'SpO2 Low Target', 'SpO2 High Target', '#00a5da')
 
     # Blok 2 grafiek 2 (???)
     x = np.linspace(0, 60, 300)
     y = np.sin(x)
-    block2_graph(414, 1261, 750, 100, x, y, '#00a5da')
+    block2_graph(*layout['blok2_onder'], x, y, '#00a5da')
 
     # Pluse / Leak labels + mini grafieken
-    block2_labels(1307, 911, 'Pluse', '144', '#0fd208')
-    block2_labels(1307, 1183, 'Leak', '18%', '#ff9900')
-    x = np.linspace(0, 20, 100)
-    y = np.sin(x)
-    block3_graph(1557, 1011, 160, 80, x, y, '#0fd208')
-    block3_graph(1557, 1283, 160, 80, x, y, '#ff9900')
+    block2_labels(*layout['pulse_labels'], 'Pluse', 'Pulse', '#0fd208', monitor)
+    block2_labels(*layout['leak_labels'], 'Leak', 'Leak', '#ff9900', monitor, '%')
+    block3_graph(*layout['pulse'], monitor, 'Pulse', '#0fd208')
+    block3_graph(*layout['leak'], monitor, 'Leak', '#ff9900')
 
     # Block 3 timer
-    block3_timer(1307, 911)
+    block3_timer(*layout['timer'])
+
+    # Labels rood bij een alarm
+    alarm_labels(alarms)
 
     # Knoppen (alleen tekst)
-    button(1795, 1248, 245, 112, 'Reset', click_reset)
-    button(2093, 1248, 245, 112, 'Stop', click_stop)
+    button(*layout['reset'], 'Reset', click_reset)
+    button(*layout['stop'], 'Stop', click_stop)
 
     # De drie verschillende blokken
-    bg_block(43, 43, 2475, 816) # Blok 1 (bovenaan)
-    bg_block(43, 911, 1211, 491) # Blok 2 (linksonder)
-    bg_block(1307, 911, 1211, 491) # Blok 3 (rechtsonder)
+    bg_block(*layout['blok1']) # Blok 1 (bovenaan)
+    bg_block(*layout['blok2']) # Blok 2 (linksonder)
+    bg_block(*layout['blok3']) # Blok 3 (rechtsonder)
+
+
+def draw_graphs(csv, monitor, breaths, alarms, screen = 0):
+    '''Bouw alle schermen één keer op en toon er één'''
+
+    # Metingen (op elk scherm, standaard verborgen)
+    metrics_overlay()
+
+    screens.build(0, draw_dashboard, csv, monitor, breaths, alarms)
+    for extra in range(1, screen_count):
+        screens.build(extra, draw_test_screen, extra)
+    screens.show(screen)
+
+    if headless:
+        # Geen venster; de frames worden door Offscreen getekend
+        return
 
     # Stel venster in op volledig scherm
     plt.get_current_fig_manager().window.state('zoomed')
 
+    scheduler.start()
     plt.show()
 
 
 # Start zowel inlezen van bestanden als tonen van de grafiek als verschillende processen zodat ze tegelijk draaien
 if __name__ == '__main__':
-    manager = Manager()
-    csv_data = manager.list() # Waardes per kolom in de CSV
-    p1 = Process(target=csv_load_data, args=(csv_data,))
-    p1.start()
-
-    draw_graphs(csv_data)
-    plt.get_current_fig_manager().window.state('zoomed') # Maximize window
-    plt.show()
+    # Pas hier het bestand openen: een proces dat met spawn gestart wordt voert de rest van dit bestand opnieuw uit
+    # (met dezelfde argumenten), en zou het bestand anders leegmaken
+    if metrics_file and not metrics_file.endswith('.json'):
+        metrics.stream(metrics_file) # Elke rij meteen naar het bestand, niet alles in het geheugen
+    csv_data, monitor_data, breath_data, alarm_data, p1 = start_loader(ingest_mode)
+    metrics.track(csv_data)
+    metrics.track(monitor_data)
+
+    fig.canvas.mpl_connect('key_press_event', key_press)
+    draw_graphs(csv_data, monitor_data, breath_data, alarm_data)
+    if headless:
+        # Zonder venster: frames met een vaste snelheid tekenen en (optioneel) opslaan
+        offscreen = Offscreen(fig, scheduler, headless_fps)
+        offscreen.start(xscale, yscale)
+        print(offscreen.run(headless_output, headless_duration))
+    else:
+        plt.get_current_fig_manager().window.state('zoomed') # Maximize window
+        plt.show()
 
     plt.close()
-    p1.kill()
\ No newline at end of file
+    stop_loader(p1, csv_data, monitor_data, breath_data, alarm_data)
+    if metrics_file:
+        metrics.dump(metrics_file)
\ No newline at end of file
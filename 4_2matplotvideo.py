@@ -1,48 +1,151 @@
 # Bron: https://docs.opencv.org/4.x/dd/d43/tutorial_py_video_display.html
-# Met aanpassing op regel 40 (bestandsnaam) 
+# Video en grafieken samen afspelen (eerst met Matplotvideo geprobeerd; attach_video_player_to_figure werkte niet)
 
-from matplotvideo import attach_video_player_to_figure
+import sys
+import matplotlib as mpl
 import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.transforms import Affine2D
+from datalezer import load_array
+from afspeelklok import ReplayClock
+from tekenlus import Scheduler
+from videospeler import VideoSource, FrameArtist
+from lettertypen import font
 
-# (timestamp, value) pairs
+mpl.rcParams['toolbar'] = 'None'
 
-# sample: big bunny scene cuts
-fancy_data = [
-    (0, 1),
-    (11.875, 1),
-    (11.917, 2),
-    (15.75, 2),
-    (15.792, 3),
-    (23.042, 3),
-    (23.083, 4),
-    (47.708, 4),
-    (47.75, 5),
-    (56.083, 5),
-    (56.125, 6),
-    (60, 6)
-]
+video_file = sys.argv[sys.argv.index('--video') + 1] if '--video' in sys.argv else 'filename.avi' # Bestand gegenereerd door 3_2webcamvideo.py
+pressure_file = '2__pressureandflow.xls'
+video_offset = float(sys.argv[sys.argv.index('--offset') + 1]) if '--offset' in sys.argv else 0 # Sessietijd van het eerste videoframe
+visible_seconds = 15 # Zichtbare tijd in de grafieken voor en na de cursor
+refresh_time = 40 # Teken een nieuw frame elke zo veel milliseconden
+line_color = '#a6a6a6'
+montserrat = font('regular')
 
+# Zelfde klok voor video en data: pauze, snelheid en zoeken werken op allebei tegelijk
+clock = ReplayClock()
+fig = plt.figure(figsize=(16, 9))
+scheduler = Scheduler(fig, refresh_time)
+dragging = False # Muis ingedrukt op de tijdlijn
 
-def on_frame(video_timestamp, line):
-    timestamps, y = zip(*fancy_data)
-    x = [timestamp - video_timestamp for timestamp in timestamps]
 
-    line.set_data(x, y)
-    line.axes.relim()
-    line.axes.autoscale_view()
-    line.axes.figure.canvas.draw()
+def video_axes(video):
+    '''Beeld van de video; de frames komen al op schermgrootte uit de cache en worden zonder schalen getekend'''
+    ax = fig.add_axes([0.05, 0.36, 0.9, 0.6])
+    ax.set_axis_off()
+    image = FrameArtist(ax)
+    fig.add_artist(image)
+    shown = None
 
+    def resize(event=None):
+        nonlocal shown
+        video.set_size(*image.fit(video.width, video.height))
+        shown = None
 
-def main():
-    fig, ax = plt.subplots()
-    plt.xlim(-15, 15)
-    plt.axvline(x=0, color='k', linestyle='--')
+    def update(_):
+        nonlocal shown
+        index, frame = video.frame_at(clock.now(), wait=0.01)
+        if index == shown or frame is None:
+            # Zelfde frame, of nog niet gedecodeerd (dan blijft het vorige staan tot het er is)
+            return []
+        shown = index
+        image.set_frame(frame)
+        return [image]
+
+    resize()
+    fig.canvas.mpl_connect('resize_event', resize)
+    scheduler.add(update, [image])
+
+
+def waveform_axes(rect, data, column, title, color):
+    '''Grafiek van één kanaal, één keer geplot; per frame verschuift alleen de transformatie (cursor staat vast op 0)'''
+    ax = fig.add_axes(rect)
+    ax.set_xlim(-visible_seconds, visible_seconds)
+    ax.set_ylim(np.nanmin(data[:, column]) - 1, np.nanmax(data[:, column]) + 1)
+    ax.xaxis.set_tick_params(labelbottom=False, length=0)
+    ax.yaxis.set_tick_params(labelsize=8, length=0)
+    for spine in ('top', 'right', 'bottom'):
+        ax.spines[spine].set_visible(False)
+    ax.set_title(title, loc='left', font=montserrat, color=color)
+    ax.axvline(0, color=line_color, linestyle='--')
+    shift = Affine2D() # Sessietijd -> tijd ten opzichte van de cursor
+    line, = ax.plot(data[:, 0], data[:, column], color=color, transform=shift + ax.transData)
+    shown = None
+
+    def update(_):
+        nonlocal shown
+        now = clock.now()
+        if now == shown:
+            return []
+        shown = now
+        shift.clear().translate(-now, 0)
+        return [line]
+
+    scheduler.add(update, [line])
+
+
+def timeline_axes(duration):
+    '''Tijdlijn over de hele opname; klikken of slepen zoekt naar dat punt'''
+    ax = fig.add_axes([0.05, 0.02, 0.9, 0.02])
+    ax.set_xlim(0, duration)
+    ax.set_ylim(0, 1)
+    ax.set_yticks([])
+    ax.xaxis.set_tick_params(labelsize=8)
+    marker, = ax.plot([0, 0], [0, 1], color='#f30170', linewidth=3)
 
-    line, = ax.plot([], [], color='blue')
+    def update(_):
+        now = min(clock.now(), duration)
+        if marker.get_xdata()[0] == now:
+            return []
+        marker.set_xdata([now, now])
+        return [marker]
 
-    attach_video_player_to_figure(fig, "filename.avi", on_frame, line=line) # Bestand gegenereerd door 3_2webcamvideo.py (NB: Deze functie van Matplotvideo werkt niet)
+    def scrub(event):
+        global dragging
+        if event.name == 'button_press_event':
+            dragging = event.inaxes == ax and event.button == 1
+        elif event.name == 'button_release_event':
+            dragging = False
+        if dragging and event.inaxes == ax and event.xdata is not None:
+            clock.seek(event.xdata)
 
+    scheduler.add(update, [marker])
+    for name in ('button_press_event', 'motion_notify_event', 'button_release_event'):
+        fig.canvas.mpl_connect(name, scrub)
+    return ax
+
+
+def key_press(event):
+    '''Toetsenbord: spatie pauzeert, links/rechts zoekt 5 seconden, omhoog/omlaag past de snelheid aan'''
+    if event.key == ' ':
+        clock.toggle()
+    elif event.key in ('left', 'right'):
+        clock.step(5 if event.key == 'right' else -5)
+    elif event.key in ('up', 'down'):
+        clock.set_speed(min(clock.speed * 2, 32) if event.key == 'up' else max(clock.speed / 2, 0.25))
+
+
+def build(video, data):
+    '''Video, druk- en flowgrafiek en tijdlijn in de figure'''
+    video_axes(video)
+    waveform_axes([0.05, 0.22, 0.9, 0.1], data, 1, 'Druk', '#f30170')
+    waveform_axes([0.05, 0.08, 0.9, 0.1], data, 2, 'Flow', '#000000')
+    timeline_axes(max(video.times[-1] if len(video.times) > 0 else 0, data[-1, 0]))
+    fig.canvas.mpl_connect('key_press_event', key_press)
+
+
+def main():
+    try:
+        video = VideoSource(video_file, video_offset)
+    except OSError as error:
+        print(error, '(maak eerst een opname met 3_2webcamvideo.py, of geef een bestand op met --video)')
+        return
+    _, data = load_array(pressure_file)
+    build(video, data)
+    scheduler.start()
     plt.show()
+    video.close()
 
 
-main()
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -1,23 +1,33 @@
 # Bron: https://docs.opencv.org/4.x/dd/d43/tutorial_py_video_display.html
-# Met aanpassing op regel 7 (bestandsnaam) 
+# Met aanpassing op regel 7 (bestandsnaam)
+# Nu via videoverwerking.Pipeline: lezen in batches, grijs maken (en evt. verkleinen en de tijd erin) in een pool van
+# threads, en naar het scherm en/of een bestand. --output schrijft naar een bestand, --headless zonder venster.
+import sys
+from videoverwerking import Pipeline, Grayscale, Resize, Timestamp, FileOutput, DisplayOutput
+video_file = sys.argv[sys.argv.index('--video') + 1] if '--video' in sys.argv else 'filename.avi' # Bestand gegenereerd door 3_2webcamvideo.py
 
-import numpy as np
-import cv2 as cv
- 
-cap = cv.VideoCapture('filename.avi') # Bestand gegenereerd door 3_2webcamvideo.py
- 
-while cap.isOpened():
-    ret, frame = cap.read()
- 
-    # if frame is read correctly ret is True
-    if not ret:
-        print("Can't receive frame (stream end?). Exiting ...")
-        break
-    gray = cv.cvtColor(frame, cv.COLOR_BGR2GRAY)
- 
-    cv.imshow('frame', gray)
-    if cv.waitKey(1) == ord('q'):
-        break
- 
-cap.release()
-cv.destroyAllWindows()
+output_file = sys.argv[sys.argv.index('--output') + 1] if '--output' in sys.argv else None
+headless = '--headless' in sys.argv
+width = int(sys.argv[sys.argv.index('--width') + 1]) if '--width' in sys.argv else None # Verkleinen naar deze breedte
+start = float(sys.argv[sys.argv.index('--start') + 1]) if '--start' in sys.argv else None # Sessietijd (seconden)
+end = float(sys.argv[sys.argv.index('--end') + 1]) if '--end' in sys.argv else None
+
+transforms = [Grayscale()]
+if width is not None:
+    transforms.append(Resize(width))
+transforms.append(Timestamp())
+
+outputs = []
+if output_file is not None:
+    outputs.append(FileOutput(output_file))
+if not headless:
+    outputs.append(DisplayOutput('frame'))
+
+try:
+    stats = Pipeline(video_file, transforms, outputs).run(start, end)
+except OSError as error:
+    print(error)
+    sys.exit(1)
+
+print(f"{stats['frames']} frames in {stats['seconds']:.2f} s: {stats['fps']:.0f} fps (lezen {stats['read_fps']:.0f} fps), "
+      f"{stats['realtime']:.1f}x sneller dan de opname")
@@ -2,11 +2,12 @@ import matplotlib.pyplot as plt
 import numpy as np
 import matplotlib as mpl
 from pathlib import Path
-import csv
 import time
-from multiprocessing import Process, Manager
+from multiprocessing import Process
 from matplotlib.animation import FuncAnimation
 from matplotlib.widgets import Button
+from datalezer import CsvTail
+from ringbuffer import SampleRing
 
 # Geen toolbar
 mpl.rcParams['toolbar'] = 'None'
@@ -30,6 +31,7 @@ line_color = '#a6a6a6'
 # Timestamp waarop het programma start (dit wordt het punt Time=0 in de files)
 start_time = time.time()
 refresh_time = 100 # Laad nieuwe data elke zo veel milliseconden
+buffer_size = 2 * 60 * 60 * 25 # Aantal samples dat bewaard wordt (ongeveer 2 uur bij 25 samples per seconde)
 
 # Animaties en buttons werken alleen vanuit een global
 animations = []
@@ -104,11 +106,10 @@ def block1_graph(x, y, w, h, csv, csv_col, color='#000000', lines=[]):
     line, = ax.plot([], [], color=color, linewidth=3*window_scale)
 
     def update(_):
-        if len(csv) == 0:
+        data = csv.window(0, timescale) # Alleen het zichtbare deel (kopie uit het gedeelde geheugen)
+        if len(data) == 0:
             return line,
-        xvalues = csv[0]
-        yvalues = csv[csv_col]
-        line.set_data(xvalues, yvalues)
+        line.set_data(data[:, 0], data[:, csv_col])
         return line,
 
     animations.append(FuncAnimation(fig, update, interval=refresh_time, save_count=1))
@@ -211,49 +212,15 @@ def button(x, y, w, h, title, onclick=None):
     fig.add_axes(ax)
 
 
-def csv_file(filename, delimiter='\t', time_col=0, start=0, end=-1):
-    '''Lezen van het CSV bestand op basis van time kolom (met headers als time_col is string, anders met kolomnummer vanaf 0 [=standaard])'''
-    result = []
-    with open(filename) as file:
-        reader = csv.DictReader(file, delimiter=delimiter) if type(time_col) == str else csv.reader(file, delimiter=delimiter)
-        for row in reader:
-            if not (time_col in row if type(row) == 'dict' else len(row) > 0):
-                # Geen timestamp niet in deze rij; sla over
-                continue
-            try:
-                row_time = float(row[time_col])
-            except ValueError:
-                # Geen geldige timestamp in deze rij; sla over
-                continue
-            if start >= 0 and row_time < start:
-                # Dit hebben we al eerder ingelezen, nu overslaan
-                continue
-            if end >= 0 and row_time >= end:
-                # Hier zijn we nog niet, stop met inladen
-                break
-            result.append(row)
-    return result
-
-
 def csv_load_data(csv_data):
     '''Laad CSV data uit bestand (constant)'''
     filename='2__pressureandflow.xls'
+    tail = CsvTail(filename) # Onthoudt tot waar het bestand al gelezen is
     while True:
-        last_time = csv_data[0][-1] if len(csv_data) > 0 and len(csv_data[0]) > 0 else float(0)
         current_time = time.time() - start_time
-        data = csv_file(filename, start=last_time, end=current_time)
-        for row in data:
-            # Split the data to the appropriate lists (by column)
-            for i in range(0, len(row)):
-                while len(csv_data) <= i:
-                    csv_data.append([])
-                l = csv_data[i]
-                try:
-                    v = float(row[i])
-                except ValueError:
-                    v = None
-                l.append(v)
-                csv_data[i] = l
+        data = tail.read_array(end=current_time) # Alle nieuwe rijen in één keer als floats (ongeldige waardes zijn NaN)
+        if len(data) > 0:
+            csv_data.append(data)
         # if len(data) > 0:
         #     print('CSV: ', len(data), 'new rows')
         time.sleep(refresh_time / 1000)
@@ -273,6 +240,7 @@ def click_stop(event):
     print('STOP')
     plt.close()
     p1.kill()
+    csv_data.close()
     exit()
 
 
@@ -335,8 +303,7 @@ def draw_graphs(csv):
 
 # Start zowel inlezen van bestanden als tonen van de grafiek als verschillende processen zodat ze tegelijk draaien
 if __name__ == '__main__':
-    manager = Manager()
-    csv_data = manager.list() # Waardes per kolom in de CSV
+    csv_data = SampleRing.create(buffer_size, 3) # Waardes per kolom in de CSV (tijd, druk, flow)
     p1 = Process(target=csv_load_data, args=(csv_data,))
     p1.start()
 
@@ -345,4 +312,5 @@ if __name__ == '__main__':
     plt.show()
 
     plt.close()
-    p1.kill()
\ No newline at end of file
+    p1.kill()
+    csv_data.close()
\ No newline at end of file
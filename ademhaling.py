@@ -0,0 +1,81 @@
+import numpy as np
+
+# Kanalen van de ademhalingen (één rij per afgeronde ademhaling)
+breath_channels = ['Time', 'PIP', 'PEEP', 'RR', 'Vti', 'Vte']
+
+
+class BreathDetector:
+    '''Herkent ademhalingen in een stroom druk/flow samples, batch voor batch (elk sample wordt één keer bekeken)
+
+    Een ademhaling begint als de flow van negatief (uitademen) naar positief (inademen) gaat, met een drempel
+    (hysterese) rond 0 zodat ruis geen extra ademhalingen geeft. Het volume is de geïntegreerde flow (trapeziumregel)
+    vanaf het begin van de ademhaling. Per afgeronde ademhaling: PIP (hoogste druk), PEEP (druk aan het eind van het
+    uitademen), frequentie (per minuut, uit de tijd tussen twee keer inademen), Vti (ingeademd volume) en Vte
+    (uitgeademd volume). Tussen de batches worden alleen een paar getallen bewaard (O(1) per sample).
+    Zonder lopende ademhaling (nog niet begonnen, of langer dan max_breath seconden geen nieuwe) is het volume NaN.
+    '''
+
+    def __init__(self, threshold=0.5, max_breath=10, volume_scale=1000 / 60):
+        self.threshold = threshold # Flow die nog als 0 telt
+        self.max_breath = max_breath # Langere ademhalingen (of apneu) tellen niet mee (seconden)
+        self.volume_scale = volume_scale # Flow x seconden -> volume (standaard L/min -> mL)
+        self.reset()
+
+    def reset(self):
+        '''Vergeet de lopende ademhaling (bijv. na een sprong in de tijd)'''
+        self.phase = 0 # 1 = inademen, -1 = uitademen, 0 = nog onbekend
+        self.previous = None # Laatste sample (tijd, druk, flow) van de vorige batch
+        self.start = None # Begin van de lopende ademhaling (None = geen)
+        self.volume = 0.0 # Volume van de lopende ademhaling tot en met het laatst verwerkte sample
+        self.pip = -np.inf # Hoogste druk van de lopende ademhaling
+        self.vti = None # Volume aan het eind van het inademen
+
+    def process(self, rows):
+        '''Verwerk nieuwe samples (tijd, druk, flow); geeft (samples met als extra kolom het volume, afgeronde ademhalingen)'''
+        rows = np.asarray(rows, dtype=np.float64)
+        breaths = []
+        if len(rows) == 0:
+            return np.empty((0, 4)), np.empty((0, len(breath_channels)))
+        times, pressure, flow = rows[:, 0], rows[:, 1], np.nan_to_num(rows[:, 2])
+        # Fase per sample: verandert alleen buiten de drempel, daartussen geldt de laatste fase
+        sign = np.where(flow > self.threshold, 1, np.where(flow < -self.threshold, -1, 0))
+        last = np.maximum.accumulate(np.where(sign != 0, np.arange(len(rows)), -1))
+        phase = np.where(last >= 0, sign[last], self.phase)
+        before = np.concatenate(([self.phase], phase[:-1]))
+        # Volume-stap per sample (trapezium met het vorige sample, ook over de grens met de vorige batch)
+        previous = self.previous if self.previous is not None else rows[0]
+        steps = np.diff(np.concatenate(([previous[0]], times))) * (flow + np.concatenate(([np.nan_to_num(previous[2])], flow[:-1]))) / 2 * self.volume_scale
+        cumulative = np.cumsum(steps)
+        volume = np.full(len(rows), np.nan)
+        # Per stuk tussen twee fase-wisselingen (meestal maar een paar per ademhaling)
+        bounds = np.concatenate(([0], np.flatnonzero(phase != before), [len(rows)]))
+        for a, b in zip(bounds[:-1], bounds[1:]):
+            if a == b:
+                continue
+            if phase[a] == -1 and before[a] == 1 and self.start is not None:
+                # Eind van het inademen
+                self.vti = self.volume
+            elif phase[a] == 1 and before[a] == -1:
+                # Begin van het inademen: de vorige ademhaling (als die er was) is af
+                if self.start is not None and self.vti is not None:
+                    end_pressure = pressure[a - 1] if a > 0 else previous[1]
+                    breaths.append((times[a], self.pip, end_pressure, 60 / (times[a] - self.start), self.vti, self.vti - self.volume))
+                self.start = times[a]
+                self.volume = -steps[a] # Zodat het volume op dit sample 0 is
+                self.pip = -np.inf
+                self.vti = None
+            if self.start is None:
+                continue
+            segment = self.volume + cumulative[a:b] - (cumulative[a - 1] if a > 0 else 0)
+            late = times[a:b] - self.start > self.max_breath
+            if late.any():
+                # Te lang geen nieuwe ademhaling: vanaf hier geen volume tot de volgende
+                volume[a:a + np.argmax(late)] = segment[:np.argmax(late)]
+                self.start = None
+                continue
+            volume[a:b] = segment
+            self.volume = segment[-1]
+            self.pip = np.fmax.reduce(pressure[a:b], initial=self.pip)
+        self.phase = phase[-1]
+        self.previous = rows[-1, :3]
+        return np.column_stack((rows[:, :3], volume)), np.array(breaths).reshape(-1, len(breath_channels))
@@ -0,0 +1,89 @@
+import time
+from multiprocessing import Array
+
+# Plaatsen in de gedeelde toestand van de klok
+ANCHOR_WALL = 0 # Tijdstip (time.time()) van het laatste ijkpunt
+ANCHOR_SESSION = 1 # Sessietijd op het laatste ijkpunt
+SPEED = 2 # Afspeelsnelheid (1 = realtime)
+PAUSED = 3 # 1 = gepauzeerd
+SEEKS = 4 # Aantal keer dat er gezocht (gesprongen) is
+
+
+class ReplayClock:
+    '''Klok voor het afspelen van een opname: realtime, N keer sneller, pauze, stappen en zoeken naar een tijdstip
+
+    De toestand staat in gedeeld geheugen, zodat het inlees-proces en het dashboard precies dezelfde tijd gebruiken.
+    Bij een sprong in de tijd (seek/step) wordt SEEKS verhoogd; wie data buffert weet dan dat die opnieuw geladen moet worden.
+    '''
+
+    def __init__(self, start=0, speed=1):
+        self.state = Array('d', 5)
+        self.state[ANCHOR_WALL] = time.time()
+        self.state[ANCHOR_SESSION] = start
+        self.state[SPEED] = speed
+        self.state[PAUSED] = 0
+        self.state[SEEKS] = 0
+
+    def now(self):
+        '''Huidige sessietijd (seconden)'''
+        with self.state.get_lock():
+            if self.state[PAUSED]:
+                return self.state[ANCHOR_SESSION]
+            return self.state[ANCHOR_SESSION] + (time.time() - self.state[ANCHOR_WALL]) * self.state[SPEED]
+
+    def _anchor(self, session_time):
+        '''Nieuw ijkpunt: vanaf nu loopt de klok verder vanaf session_time'''
+        self.state[ANCHOR_WALL] = time.time()
+        self.state[ANCHOR_SESSION] = max(session_time, 0)
+
+    @property
+    def speed(self):
+        return self.state[SPEED]
+
+    @property
+    def paused(self):
+        return bool(self.state[PAUSED])
+
+    @property
+    def seeks(self):
+        return int(self.state[SEEKS])
+
+    def set_speed(self, speed):
+        with self.state.get_lock():
+            self._anchor(self.now())
+            self.state[SPEED] = speed
+
+    def pause(self):
+        with self.state.get_lock():
+            self._anchor(self.now())
+            self.state[PAUSED] = 1
+
+    def resume(self):
+        with self.state.get_lock():
+            self._anchor(self.now())
+            self.state[PAUSED] = 0
+
+    def toggle(self):
+        '''Pauzeren of weer verder afspelen'''
+        if self.paused:
+            self.resume()
+        else:
+            self.pause()
+
+    def seek(self, session_time):
+        '''Spring naar een sessietijd'''
+        with self.state.get_lock():
+            self._anchor(session_time)
+            self.state[SEEKS] += 1
+
+    def step(self, seconds):
+        '''Stap vooruit (of met een negatief getal terug), ook als de klok gepauzeerd is'''
+        self.seek(self.now() + seconds)
+
+    def sleep_until(self, session_time, interval=0.1):
+        '''Wacht tot de klok op session_time staat (houdt rekening met snelheid, pauze en zoeken)'''
+        while True:
+            remaining = session_time - self.now()
+            if remaining <= 0:
+                return
+            time.sleep(interval if self.paused else min(remaining / self.speed, interval))
@@ -0,0 +1,81 @@
+import numpy as np
+
+
+class AlarmRule:
+    '''Eén grenscontrole: een kanaal boven (high) of onder (low) een grens (een ander kanaal of een vast getal)
+
+    hysteresis: zo ver moet de waarde terug binnen de grens zijn voor het alarm weer uit gaat (tegen knipperen).
+    debounce: zo veel seconden moet de waarde over de grens blijven voor het alarm aan gaat.
+    label: naam van het label op het scherm dat bij dit alarm hoort (standaard het kanaal).
+    '''
+
+    def __init__(self, name, channel, limit, direction='high', hysteresis=0, debounce=0, label=None):
+        self.name = name
+        self.channel = channel
+        self.limit = limit
+        self.direction = direction
+        self.hysteresis = hysteresis
+        self.debounce = debounce
+        self.label = label if label is not None else channel
+
+
+class AlarmEngine:
+    '''Controleert alle regels tegelijk (NumPy, rijen x regels) over elke nieuwe batch monitordata
+
+    Tussen de batches wordt per regel alleen bewaard of de waarde over de grens is, sinds wanneer, en of het alarm aan
+    staat. process() geeft alleen de rijen terug waarop een alarm aan of uit ging (tijd + 0/1 per regel), zodat de
+    ringbuffer met alarmen (kanalen: channels) en het scherm alleen bij een verandering iets hoeven te doen.
+    Ontbrekende waardes of grenzen (0 = geen meting, of NaN) zetten een alarm niet aan en ook niet uit.
+    '''
+
+    def __init__(self, rules, names):
+        self.rules = list(rules)
+        index = {name: i for i, name in enumerate(names)}
+        self.values = np.array([index[rule.channel] for rule in self.rules], dtype=np.int64)
+        limit_channels = [type(rule.limit) == str for rule in self.rules]
+        self.limit_columns = np.array([index[rule.limit] if is_channel else 0 for rule, is_channel in zip(self.rules, limit_channels)], dtype=np.int64)
+        self.limit_is_channel = np.array(limit_channels)
+        self.limit_values = np.array([np.nan if is_channel else rule.limit for rule, is_channel in zip(self.rules, limit_channels)], dtype=np.float64)
+        self.sign = np.array([1 if rule.direction == 'high' else -1 for rule in self.rules])
+        self.hysteresis = np.array([rule.hysteresis for rule in self.rules], dtype=np.float64)
+        self.debounce = np.array([rule.debounce for rule in self.rules], dtype=np.float64)
+        self.reset()
+
+    @property
+    def channels(self):
+        '''Kanalen van de alarm-rijen: tijd en per regel 0 (uit) of 1 (aan)'''
+        return ['Time'] + [rule.name for rule in self.rules]
+
+    def reset(self):
+        '''Alle alarmen uit (bijv. na een sprong in de tijd)'''
+        self.over = np.zeros(len(self.rules), dtype=bool) # Waarde over de grens (met hysterese)
+        self.onset = np.full(len(self.rules), np.nan) # Sinds wanneer over de grens
+        self.active = np.zeros(len(self.rules), dtype=bool) # Alarm aan (na debounce)
+
+    def process(self, rows):
+        '''Controleer nieuwe rijen monitordata (2-D, kanalen als names); geeft de rijen waarop een alarm veranderde'''
+        rows = np.asarray(rows, dtype=np.float64)
+        if len(rows) == 0 or len(self.rules) == 0:
+            return np.empty((0, len(self.rules) + 1))
+        times = rows[:, 0]
+        values = rows[:, self.values]
+        limits = np.where(self.limit_is_channel, rows[:, self.limit_columns], self.limit_values)
+        measured = (values != 0) & ~np.isnan(values) & ((limits != 0) | ~self.limit_is_channel) & ~np.isnan(limits)
+        excess = (values - limits) * self.sign # > 0: over de grens
+        raised = measured & (excess > 0)
+        cleared = measured & (excess <= -self.hysteresis)
+        # Over de grens: gezet door raised, weer uit door cleared, daartussen (en zonder meting) blijft het zoals het was
+        steps = np.arange(len(rows))[:, None]
+        columns = np.arange(len(self.rules))
+        last = np.maximum.accumulate(np.where(raised | cleared, steps, -1), axis=0)
+        over = np.where(last >= 0, raised[np.maximum(last, 0), columns], self.over)
+        # Begin van het over de grens zijn (voor de debounce), ook als dat in een eerdere batch was
+        before = np.vstack((self.over, over[:-1]))
+        started = np.maximum.accumulate(np.where(over & ~before, steps, -1), axis=0)
+        onset = np.where(started >= 0, times[np.maximum(started, 0)], self.onset)
+        active = over & (times[:, None] - onset >= self.debounce)
+        changed = np.flatnonzero((active != np.vstack((self.active, active[:-1]))).any(axis=1))
+        self.over = over[-1]
+        self.onset = np.where(over[-1], onset[-1], np.nan)
+        self.active = active[-1]
+        return np.column_stack((times[changed], active[changed]))
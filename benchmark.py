@@ -0,0 +1,304 @@
+import importlib.util
+import json
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import deque
+from pathlib import Path
+import matplotlib as mpl
+mpl.use('Agg') # Geen venster nodig
+import numpy as np
+from datalezer import CsvTail, load_array
+from ringbuffer import SampleRing
+from zonderscherm import Offscreen
+
+monitor_file = '2__monitordata.xls'
+pressure_file = '2__pressureandflow.xls'
+baseline_file = 'benchmark_baseline.json' # Per machine, niet in git (.gitignore); een ander bestand met --baseline
+session_minutes = [1, 15, 60, 240] # Lengtes van de synthetische sessies
+refresh_rates = [10, 25, 50] # Frames per seconde
+tolerance = 1.5 # Hoeveel keer slechter dan de baseline nog geen regressie is (aan te passen met --tolerance)
+
+
+def load_dashboard():
+    '''Laad het dashboard-script als module (de bestandsnaam begint met een cijfer, dus geen gewone import)'''
+    spec = importlib.util.spec_from_file_location('dashboard', '4_1verschillendeschermen.py')
+    dashboard = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(dashboard)
+    return dashboard
+
+
+def measure(function, repeat=5):
+    '''Snelste tijd (in seconden) van een aantal keer uitvoeren'''
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        duration = time.perf_counter() - started
+        best = duration if best is None else min(best, duration)
+    return best
+
+
+def row_by_row(dashboard, filename, time_col):
+    '''De oude manier: csv_file() per rij en daarna per cel float() (None bij ongeldige waardes)'''
+    result = []
+    for row in dashboard.csv_file(filename, time_col=time_col):
+        values = row.values() if type(row) == dict else row
+        converted = []
+        for value in values:
+            try:
+                converted.append(float(value))
+            except ValueError:
+                converted.append(None)
+        result.append(converted)
+    return result
+
+
+def bench_parse(dashboard):
+    '''Vergelijk het inlezen per rij met de NumPy bulk-parser'''
+    print('Inlezen (row-by-row vs. bulk):')
+    for filename, time_col in ((monitor_file, 'Time'), (pressure_file, 0)):
+        old = measure(lambda: row_by_row(dashboard, filename, time_col))
+        bulk = measure(lambda: load_array(filename))
+        tail = measure(lambda: CsvTail(filename, time_col=time_col).read_array())
+        print(f'  {filename}: {old * 1000:.1f} ms -> load_array {bulk * 1000:.1f} ms ({old / bulk:.1f}x), '
+              f'CsvTail.read_array {tail * 1000:.1f} ms ({old / tail:.1f}x)')
+
+
+def bench_ingest(dashboard, seconds=5, start=60):
+    '''Vergelijk de vertraging van sample tot scherm: inlezen in een apart proces of in een thread'''
+    print('Vertraging sample -> scherm (proces vs. thread):')
+    for mode in ('process', 'thread'):
+        dashboard.clock.seek(start)
+        *buffers, loader = dashboard.start_loader(mode)
+        csv_data = buffers[0]
+        dashboard.scheduler.clear()
+        dashboard.fig.clear()
+        dashboard.block1_graph(*dashboard.layout['druk'], csv_data, 1, '#f30170', [25])
+        dashboard.fig.canvas.draw()
+        time.sleep(0.5) # Eerst de achterstand tot de starttijd laten inlezen
+        latencies = []
+        ended = time.perf_counter() + seconds
+        while time.perf_counter() < ended:
+            frame_start = time.perf_counter()
+            newest = csv_data.last(1)
+            dashboard.scheduler.tick()
+            if len(newest) > 0:
+                # Hoe oud is de nieuwste getekende sample op het moment dat hij op het scherm staat
+                latencies.append(dashboard.clock.now() - newest[0, 0])
+            time.sleep(max(dashboard.refresh_time / 1000 - (time.perf_counter() - frame_start), 0))
+        dashboard.stop_loader(loader, *buffers)
+        latencies = np.array(latencies) * 1000
+        print(f'  {mode}: gemiddeld {latencies.mean():.1f} ms, p95 {np.percentile(latencies, 95):.1f} ms, max {latencies.max():.1f} ms')
+
+
+def synthetic_session(directory, minutes):
+    '''Schrijf een synthetische opname van minutes minuten (zelfde opmaak als de exports): de echte data herhaald'''
+    _, pressure = load_array(pressure_file)
+    _, monitor = load_array(monitor_file)
+    seconds = minutes * 60
+    rows = int(seconds * 25)
+    pressure = np.resize(pressure, (rows, pressure.shape[1]))
+    pressure[:, 0] = np.arange(rows) / 25
+    monitor = np.resize(monitor, (seconds, monitor.shape[1]))
+    monitor[:, 0] = np.arange(seconds)
+    files = (Path(directory) / f'druk_{minutes}.xls', Path(directory) / f'monitor_{minutes}.xls')
+    np.savetxt(files[0], pressure, fmt='%.3f', delimiter='\t')
+    with open(monitor_file) as file:
+        header = file.readline().rstrip('\r\n')
+    np.savetxt(files[1], monitor, fmt='%.6g', delimiter='\t', header=header, comments='')
+    return files, pressure, monitor
+
+
+def reset_dashboard(dashboard):
+    '''Alles van de figure weggooien, zodat het dashboard opnieuw opgebouwd kan worden'''
+    dashboard.scheduler.clear()
+    dashboard.fig.clear()
+    dashboard.layout.clear()
+    dashboard.screens = dashboard.Screens(dashboard.fig, dashboard.scheduler)
+    dashboard.buttons = []
+
+
+def ingest(buffers, stages, pressure, monitor):
+    '''Voeg samples toe zoals csv_load_data() dat doet (druk/flow door de ademhalingsdetectie, monitordata door de alarmen)'''
+    csv_data, monitor_data, breath_data, alarm_data = buffers
+    detector, engine = stages
+    data, breaths = detector.process(pressure)
+    csv_data.append(data)
+    monitor_data.append(monitor)
+    if len(breaths) > 0:
+        breath_data.append(breaths)
+    events = engine.process(monitor_data.last(len(monitor)) if len(monitor) > 0 else monitor)
+    if len(events) > 0:
+        alarm_data.append(events)
+
+
+def build(dashboard, pressure, monitor, end):
+    '''Vul de buffers tot sessietijd end en bouw het dashboard zonder venster op; geeft buffers, verwerking en Offscreen terug'''
+    dashboard.clock.seek(end)
+    buffers = dashboard.create_buffers(shared=False)
+    stages = (dashboard.BreathDetector(), dashboard.AlarmEngine(dashboard.alarm_rules, buffers[1].names))
+    ingest(buffers, stages, pressure[pressure[:, 0] < end], monitor[monitor[:, 0] < end])
+    reset_dashboard(dashboard)
+    dashboard.headless = True
+    dashboard.draw_graphs(*buffers)
+    offscreen = Offscreen(dashboard.fig, dashboard.scheduler)
+    offscreen.start(dashboard.xscale, dashboard.yscale)
+    return buffers, stages, offscreen
+
+
+def feeder(dashboard, buffers, stages, pressure, monitor):
+    '''Callback voor Offscreen.run(): voeg voor elk frame de samples toe die volgens de klok binnengekomen zijn'''
+    fed = [dashboard.clock.now()]
+
+    def feed(frame, number):
+        now = dashboard.clock.now()
+        ingest(buffers, stages, pressure[(pressure[:, 0] >= fed[0]) & (pressure[:, 0] < now)],
+               monitor[(monitor[:, 0] >= fed[0]) & (monitor[:, 0] < now)])
+        fed[0] = now
+
+    return feed
+
+
+def bench_render(dashboard, pressure, monitor, minutes, rate, frames=50):
+    '''Opbouwen, volledig tekenen en geblitte frames (hele sessie zichtbaar, het zwaarste geval) bij een frame-snelheid'''
+    end = minutes * 60 - 10 # Laatste 10 seconden komen binnen tijdens het tekenen
+    dashboard.time_window = dashboard.time_windows.index(None)
+    started = time.perf_counter()
+    buffers, stages, offscreen = build(dashboard, pressure, monitor, end)
+    build_ms = (time.perf_counter() - started) * 1000
+    full = []
+    for _ in range(3):
+        started = time.perf_counter()
+        dashboard.fig.canvas.draw()
+        full.append((time.perf_counter() - started) * 1000)
+    offscreen.rate = rate
+    dashboard.scheduler.frame_times = deque(maxlen=frames)
+    offscreen.run(frames=frames, callback=feeder(dashboard, buffers, stages, pressure, monitor))
+    blit = np.array(dashboard.scheduler.frame_times)
+    result = {
+        'build_ms': build_ms,
+        'full_ms': float(np.median(full)),
+        'blit_ms': float(blit.mean()) if len(blit) > 0 else 0.0,
+        'blit_p95_ms': float(np.percentile(blit, 95)) if len(blit) > 0 else 0.0,
+        'late': offscreen.late / offscreen.count,
+    }
+    for buffer in buffers:
+        buffer.close()
+    return result
+
+
+def bench_memory(dashboard, pressure, monitor, minutes, frames=50):
+    '''Geheugen (tracemalloc) van het opbouwen en de groei tijdens het tekenen van frames'''
+    end = minutes * 60 - 10
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    buffers, stages, offscreen = build(dashboard, pressure, monitor, end)
+    built = tracemalloc.get_traced_memory()[0]
+    offscreen.run(frames=frames, callback=feeder(dashboard, buffers, stages, pressure, monitor))
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    for buffer in buffers:
+        buffer.close()
+    return {'build_kb': (built - before) / 1024, 'growth_kb': (after - built) / 1024, 'peak_kb': (peak - before) / 1024}
+
+
+def bench_throughput(dashboard, files, pressure, monitor, repeat=3):
+    '''Inlezen in rijen per seconde (beste van repeat keer): csv_file() (per rij) en csv_load_data() (zoals het dashboard, in een thread)'''
+    csv_file_time = measure(lambda: dashboard.csv_file(str(files[0])), repeat)
+    dashboard.pressure_file, dashboard.monitor_file = str(files[0]), str(files[1])
+    dashboard.clock.seek(pressure[-1, 0] + 1)
+    dashboard.clock.pause()
+    load_time = None
+    for _ in range(repeat):
+        csv_data = SampleRing.create(len(pressure), 4, shared=False)
+        monitor_data = SampleRing.create(len(monitor), dashboard.read_headers(dashboard.monitor_file), shared=False)
+        breath_data = SampleRing.create(len(pressure), dashboard.breath_channels, shared=False)
+        alarm_data = SampleRing.create(len(monitor), len(dashboard.alarm_rules) + 1, shared=False)
+        stop = threading.Event()
+        started = time.perf_counter()
+        loader = threading.Thread(target=dashboard.csv_load_data, args=(csv_data, monitor_data, breath_data, alarm_data, dashboard.clock, stop), daemon=True)
+        loader.start()
+        while csv_data.count < len(pressure) or monitor_data.count < len(monitor):
+            time.sleep(0.001)
+        duration = time.perf_counter() - started
+        load_time = duration if load_time is None else min(load_time, duration)
+        stop.set()
+        loader.join()
+        csv_data.close()
+        monitor_data.close()
+        breath_data.close()
+        alarm_data.close()
+    dashboard.clock.resume()
+    dashboard.pressure_file, dashboard.monitor_file = pressure_file, monitor_file
+    return {'csv_file_rows_s': len(pressure) / csv_file_time, 'csv_load_data_rows_s': (len(pressure) + len(monitor)) / load_time}
+
+
+def run_suite(dashboard):
+    '''Alle metingen voor alle sessielengtes en frame-snelheden; geeft {naam: {meting: waarde}} terug'''
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for minutes in session_minutes:
+            files, pressure, monitor = synthetic_session(directory, minutes)
+            for rate in refresh_rates:
+                name = f'{minutes}min_{rate}fps'
+                results[name] = bench_render(dashboard, pressure, monitor, minutes, rate)
+                print(f'  {name}: ' + ', '.join(f'{key} {value:.2f}' for key, value in results[name].items()))
+            name = f'{minutes}min'
+            results[name] = bench_memory(dashboard, pressure, monitor, minutes)
+            results[name].update(bench_throughput(dashboard, files, pressure, monitor))
+            print(f'  {name}: ' + ', '.join(f'{key} {value:.0f}' for key, value in results[name].items()))
+    return results
+
+
+def compare(results, baseline):
+    '''Vergelijk met de baseline; geeft een lijst met regressies terug (tijden en geheugen: lager is beter, rows_s: hoger)
+
+    Alleen gemiddeldes en medianen; p95 en het aantal te late frames worden wel getoond, maar zijn te onrustig.
+    '''
+    regressions = []
+    for name, values in results.items():
+        for key, value in values.items():
+            old = baseline.get(name, {}).get(key)
+            if old is None or key == 'late' or '_p95' in key:
+                continue
+            if key.endswith('_rows_s'):
+                worse = value < old / tolerance
+            else:
+                # Kleine absolute verschillen (bijv. een paar kB of minder dan een ms) tellen niet mee
+                worse = value > old * tolerance and value - old > (256 if key.endswith('_kb') else 1)
+            if worse:
+                regressions.append(f'{name} {key}: {old:.2f} -> {value:.2f}')
+    return regressions
+
+
+# Gebruik: python benchmark.py                (inlezen en vertraging, zoals eerder)
+#          python benchmark.py --suite        (alle metingen, vergelijken met benchmark_baseline.json)
+#          python benchmark.py --suite --update  (alle metingen opslaan als nieuwe baseline)
+#          python benchmark.py --suite --tolerance 2  (pas bij 2x slechter een regressie)
+#          python benchmark.py --suite --baseline pad/naar/baseline.json  (baseline buiten de repository)
+if __name__ == '__main__':
+    dashboard = load_dashboard()
+    if '--suite' not in sys.argv:
+        bench_parse(dashboard)
+        bench_ingest(dashboard)
+        sys.exit()
+    if '--tolerance' in sys.argv:
+        tolerance = float(sys.argv[sys.argv.index('--tolerance') + 1])
+    if '--baseline' in sys.argv:
+        baseline_file = sys.argv[sys.argv.index('--baseline') + 1]
+    print('Benchmark suite (2560x1440, zonder venster):')
+    results = run_suite(dashboard)
+    if '--update' in sys.argv or not Path(baseline_file).exists():
+        with open(baseline_file, 'w') as file:
+            json.dump(results, file, indent=1)
+        print(f'Baseline opgeslagen in {baseline_file}')
+        sys.exit()
+    with open(baseline_file) as file:
+        regressions = compare(results, json.load(file))
+    for regression in regressions:
+        print('REGRESSIE', regression)
+    print(f'{len(regressions)} regressie(s) t.o.v. {baseline_file}')
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,284 @@
+import os
+import numpy as np
+
+
+class CsvTail:
+    '''Volgt een (groeiend) CSV bestand en leest bij elke aanroep alleen de nieuw toegevoegde regels in
+
+    Onthoudt de byte-positie in het bestand, zodat niet elke keer vanaf het begin alles opnieuw geparsed hoeft te worden.
+    Een onvolledige laatste regel (nog aan het schrijven) wordt pas ingelezen als hij af is.
+    Als het bestand kleiner wordt (afgekapt) of vervangen wordt (rotatie), begint het lezen weer vanaf het begin.
+    '''
+
+    def __init__(self, filename, delimiter='\t', time_col=0):
+        self.filename = filename
+        self.delimiter = delimiter
+        self.time_col = time_col # String = met headers (zoals csv.DictReader), anders kolomnummer vanaf 0
+        self.headers = None
+        self.columns = None # Aantal kolommen (bekend na de header of de eerste regel)
+        self.offset = 0 # Byte-positie tot waar het bestand verwerkt is
+        self.pending = None # Rij die al gelezen is maar nog niet aan de beurt was (tijd >= end)
+        self.parsed = None # Idem voor read_array(): al geparsede rijen die nog niet aan de beurt waren
+        self.file_id = None
+        self._reset_index()
+
+    def _reset_index(self):
+        self.index_times = np.empty(0) # Tijd-index voor seek(): tijd per regel
+        self.index_offsets = np.empty(0, dtype=np.int64) # ... en de byte-positie van die regel
+        self.index_end = 0 # Byte-positie tot waar de index bijgewerkt is
+
+    def reset(self):
+        '''Begin opnieuw vanaf het begin van het bestand'''
+        self.headers = None
+        self.columns = None
+        self.offset = 0
+        self.pending = None
+        self.parsed = None
+        self._reset_index()
+
+    def _check_file(self):
+        '''Controleer of het bestand afgekapt of vervangen is; zo ja: opnieuw beginnen'''
+        try:
+            stat = os.stat(self.filename)
+        except FileNotFoundError:
+            return False
+        file_id = (stat.st_dev, stat.st_ino)
+        if file_id != self.file_id or stat.st_size < self.offset:
+            self.file_id = file_id
+            self.reset()
+        return stat.st_size > self.offset
+
+    def _fields(self, line):
+        return line.decode(errors='replace').rstrip('\r\n').split(self.delimiter)
+
+    def _split(self, line):
+        '''Zet een regel (bytes) om naar een rij (list, of dict als er headers zijn)'''
+        fields = self._fields(line)
+        if self.headers is not None:
+            return dict(zip(self.headers, fields))
+        return fields
+
+    def _row_time(self, row):
+        '''Timestamp van een rij, of None als er geen (geldige) timestamp in staat'''
+        if type(row) == dict:
+            value = row.get(self.time_col)
+        else:
+            value = row[self.time_col] if len(row) > self.time_col else None
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+    def read(self, start=0, end=-1):
+        '''Lees nieuwe rijen met start <= tijd < end (end < 0: geen eindtijd), net als csv_file()'''
+        result = []
+        if self.pending is not None:
+            row, row_time = self.pending
+            if end >= 0 and row_time >= end:
+                # Nog steeds niet aan de beurt
+                return result
+            self.pending = None
+            if start < 0 or row_time >= start:
+                result.append(row)
+        if not self._check_file():
+            return result
+        with open(self.filename, 'rb') as file:
+            file.seek(self.offset)
+            for line in file:
+                if not line.endswith(b'\n'):
+                    # Onvolledige laatste regel; later opnieuw proberen
+                    break
+                self.offset += len(line)
+                if self.headers is None and type(self.time_col) == str:
+                    self.headers = unique_names(self._fields(line))
+                    continue
+                row = self._split(line)
+                row_time = self._row_time(row)
+                if row_time is None:
+                    # Geen geldige timestamp in deze rij; sla over
+                    continue
+                if start >= 0 and row_time < start:
+                    # Dit hebben we al eerder ingelezen, nu overslaan
+                    continue
+                if end >= 0 and row_time >= end:
+                    # Hier zijn we nog niet, bewaar voor de volgende keer
+                    self.pending = (row, row_time)
+                    break
+                result.append(row)
+        return result
+
+    @property
+    def index(self):
+        '''Kolomnaam -> kolomnummer (alleen met headers)'''
+        return {name: i for i, name in enumerate(self.headers or [])}
+
+    def _time_index(self):
+        return self.index[self.time_col] if type(self.time_col) == str else self.time_col
+
+    def read_array(self, start=0, end=-1, max_bytes=1 << 16):
+        '''Zoals read(), maar de nieuwe rijen in één keer als 2-D float array (NaN voor ontbrekende/ongeldige waardes)
+
+        Leest in stukken van max_bytes; elk stuk wordt maar één keer geparsed. Rijen die nog niet aan de beurt zijn
+        (tijd >= end) worden bewaard (net als de rij in pending bij read()) en bij een volgende aanroep eerst gegeven,
+        zonder het bestand opnieuw te lezen. Niet door elkaar gebruiken met read().
+        '''
+        blocks = []
+        available = self._check_file()
+        if self.parsed is not None:
+            stop = self._due(self.parsed, end)
+            blocks.append(self.parsed[:stop])
+            self.parsed = self.parsed[stop:] if stop < len(self.parsed) else None
+        if available and self.parsed is None:
+            with open(self.filename, 'rb') as file:
+                file.seek(self.offset)
+                while True:
+                    chunk = file.read(max_bytes)
+                    last = chunk.rfind(b'\n')
+                    if last < 0:
+                        if len(chunk) == max_bytes:
+                            # Regel langer dan max_bytes; groter stuk lezen
+                            max_bytes *= 2
+                            file.seek(self.offset)
+                            continue
+                        # Geen volledige regel (meer)
+                        break
+                    at_end = len(chunk) < max_bytes
+                    chunk = chunk[:last + 1]
+                    if self.headers is None and type(self.time_col) == str:
+                        line_end = chunk.index(b'\n') + 1
+                        self.headers = unique_names(self._fields(chunk[:line_end]))
+                        self.columns = len(self.headers)
+                        self.offset += line_end
+                        chunk = chunk[line_end:]
+                    block = parse_block(chunk, self.columns, self.delimiter)
+                    self.columns = block.shape[1]
+                    self.offset += len(chunk)
+                    stop = self._due(block, end)
+                    blocks.append(block[:stop])
+                    if stop < len(block):
+                        # Vanaf hier nog niet aan de beurt: bewaren voor de volgende keer
+                        self.parsed = block[stop:]
+                        break
+                    if at_end:
+                        break
+                    file.seek(self.offset)
+        if len(blocks) == 0:
+            return np.empty((0, self.columns or 0))
+        result = np.concatenate(blocks)
+        times = result[:, self._time_index()]
+        # Rijen zonder geldige timestamp, of van voor start, overslaan
+        return result[times >= start] if start >= 0 else result[~np.isnan(times)]
+
+    def _due(self, block, end):
+        '''Aantal rijen aan het begin van block die aan de beurt zijn (tot de eerste rij met tijd >= end)'''
+        later = np.flatnonzero(block[:, self._time_index()] >= end) if end >= 0 and len(block) > 0 else []
+        return int(later[0]) if len(later) > 0 else len(block)
+
+    def _update_index(self):
+        '''Breid de tijd-index (tijd -> byte-positie per regel) uit met wat er sinds de vorige keer bij is gekomen'''
+        self._check_file()
+        with open(self.filename, 'rb') as file:
+            file.seek(self.index_end)
+            data = file.read()
+        data = data[:data.rfind(b'\n') + 1]
+        base = self.index_end
+        if base == 0 and type(self.time_col) == str and len(data) > 0:
+            # Header overslaan (en onthouden)
+            line_end = data.index(b'\n') + 1
+            if self.headers is None:
+                self.headers = unique_names(self._fields(data[:line_end]))
+                self.columns = len(self.headers)
+            base = line_end
+            data = data[line_end:]
+        starts, _ = _lines(data)
+        times = parse_block(data, self.columns, self.delimiter)[:, self._time_index()] if len(starts) > 0 else np.empty(0)
+        valid = ~np.isnan(times)
+        self.index_times = np.concatenate((self.index_times, times[valid]))
+        self.index_offsets = np.concatenate((self.index_offsets, starts[valid] + base))
+        self.index_end = base + len(data)
+
+    def seek(self, session_time):
+        '''Lees verder vanaf de eerste rij met tijd >= session_time (zoeken in O(log n) via de tijd-index)'''
+        self._update_index()
+        i = np.searchsorted(self.index_times, session_time, side='left')
+        self.offset = int(self.index_offsets[i]) if i < len(self.index_times) else self.index_end
+        self.pending = None
+        self.parsed = None
+
+
+def read_headers(filename, delimiter='\t'):
+    '''Lees alleen de (unieke) kolomnamen uit de eerste regel van een bestand'''
+    with open(filename, 'rb') as file:
+        return unique_names(file.readline().decode(errors='replace').rstrip('\r\n').split(delimiter))
+
+
+def unique_names(headers):
+    '''Maak kolomnamen uniek; dubbele namen krijgen een volgnummer (zoals "rScO2 2" in de monitordata)'''
+    result = []
+    for name in headers:
+        name = name.strip()
+        unique = name
+        number = 2
+        while unique in result:
+            unique = f'{name} {number}'
+            number += 1
+        result.append(unique)
+    return result
+
+
+def _lines(data):
+    '''Begin- en eindposities (\\n) van alle niet-lege regels in een blok bytes (zelfde regels als parse_block())'''
+    raw = np.frombuffer(data, dtype=np.uint8)
+    ends = np.flatnonzero(raw == ord('\n'))
+    starts = np.concatenate(([0], ends[:-1] + 1)).astype(np.int64)
+    lengths = ends - starts
+    empty = (lengths == 0) | ((lengths == 1) & (raw[ends - 1] == ord('\r')))
+    return starts[~empty], ends[~empty]
+
+
+def parse_block(data, columns=None, delimiter='\t'):
+    '''Zet een blok tekst (bytes of str) met regels in één keer om naar een 2-D float array
+
+    Ontbrekende of ongeldige waardes worden NaN, lege regels worden overgeslagen. Gebruikt de (in C geschreven) parser
+    van NumPy; alleen als die faalt (bijv. door tekst of een lege cel) wordt alsnog per regel omgezet.
+    '''
+    if type(data) == bytes:
+        data = data.decode(errors='replace')
+    lines = [line for line in data.replace('\r', '').split('\n') if len(line) > 0]
+    if columns is None:
+        columns = lines[0].count(delimiter) + 1 if len(lines) > 0 else 0
+    if len(lines) == 0:
+        return np.empty((0, columns))
+    try:
+        result = np.loadtxt(lines, delimiter=delimiter, ndmin=2, dtype=np.float64, comments=None)
+        if result.shape[1] == columns:
+            return result
+    except ValueError:
+        pass
+    result = np.full((len(lines), columns), np.nan)
+    for r, line in enumerate(lines):
+        for i, value in enumerate(line.split(delimiter)[:columns]):
+            try:
+                result[r, i] = float(value)
+            except ValueError:
+                pass
+    return result
+
+
+def load_array(filename, delimiter='\t'):
+    '''Lees een heel bestand in één keer in als 2-D float array
+
+    Geeft (kolomnaam -> kolomnummer, array) terug. Zonder header heten de kolommen "Time", "Kolom 1", "Kolom 2", ...
+    '''
+    with open(filename, 'rb') as file:
+        data = file.read()
+    first_end = data.find(b'\n') + 1
+    first = data[:first_end].decode(errors='replace').rstrip('\r\n').split(delimiter)
+    try:
+        float(first[0])
+        names = ['Time'] + [f'Kolom {i}' for i in range(1, len(first))]
+    except ValueError:
+        # Eerste regel is een header
+        names = unique_names(first)
+        data = data[first_end:]
+    return {name: i for i, name in enumerate(names)}, parse_block(data, len(names), delimiter)
@@ -0,0 +1,216 @@
+import os
+import numpy as np
+from ringbuffer import SampleRing
+
+
+def bucket_rows(rows, resolution, kind='minmax', mins=None, maxs=None):
+    '''Vat rijen (tijd + kanalen, oplopend in tijd) samen in stukjes van resolution seconden
+
+    De stukjes liggen vast in de tijd (veelvouden van resolution), zodat ze niet verspringen als het venster schuift.
+    kind='minmax' geeft per stukje twee rijen (minimum en maximum, zodat pieken zichtbaar blijven), kind='mean' één rij
+    met het gemiddelde. Met mins/maxs (al samengevatte data) worden die gebruikt voor het minimum en maximum.
+    '''
+    if len(rows) == 0:
+        return rows
+    ids = np.floor(rows[:, 0] / resolution).astype(np.int64)
+    edges = np.concatenate(([0], np.flatnonzero(np.diff(ids)) + 1))
+    times = ids[edges] * resolution
+    values = rows[:, 1:]
+    if kind == 'mean':
+        valid = ~np.isnan(values)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.add.reduceat(np.where(valid, values, 0), edges, axis=0) / np.add.reduceat(valid, edges, axis=0)
+        return np.column_stack((times, means))
+    low = np.fmin.reduceat(values if mins is None else mins, edges, axis=0)
+    high = np.fmax.reduceat(values if maxs is None else maxs, edges, axis=0)
+    result = np.empty((2 * len(edges), rows.shape[1]))
+    result[0::2, 0] = times
+    result[1::2, 0] = times + resolution / 2
+    result[0::2, 1:] = low
+    result[1::2, 1:] = high
+    return result
+
+
+class TieredHistory:
+    '''Geschiedenis van een datastroom met begrensd geheugen, in lagen
+
+    - Recent: alle samples in een ringbuffer (raw_seconds lang), voor de grafieken en labels van dit moment.
+    - Ouder: per bucket_seconds het minimum, maximum en gemiddelde per kanaal in een tweede ringbuffer; die krijgt de
+      rest van max_bytes en gaat daarmee (bij 1 seconde per bucket) vele uren terug.
+    - Optioneel: alle samples ook naar een bestand op schijf (spill; float64, rij na rij), zodat oudere stukken ook op
+      volle resolutie op te vragen zijn.
+    Net als SampleRing één schrijver (append/reset) en meerdere lezers, ook in andere processen. query() geeft elk
+    tijdbereik terug met een gevraagde resolutie en kiest zelf de laag. Voor de rest gedraagt het zich als de ringbuffer
+    met recente data (last, window, version, ...).
+    '''
+
+    def __init__(self, raw, summary, bucket_seconds, spill=None):
+        self.raw = raw
+        self.summary = summary # Kanalen: tijd (begin van de bucket), minima, maxima, gemiddeldes
+        self.bucket_seconds = bucket_seconds
+        self.spill = spill
+        self.spill_file = None # Alleen bij de schrijver open
+        self.pending = np.empty((0, raw.channels)) # Samples van de bucket die nog niet af is (alleen bij de schrijver)
+
+    @classmethod
+    def create(cls, channels, rate, raw_seconds=600, bucket_seconds=1, max_bytes=32 << 20, spill=None, shared=True):
+        '''Maak een nieuwe geschiedenis; rate is het aantal samples per seconde (voor de grootte van de recente laag)'''
+        names = None
+        if type(channels) != int:
+            names = list(channels)
+            channels = len(names)
+        raw_capacity = int(raw_seconds * rate)
+        summary_channels = 1 + 3 * (channels - 1)
+        free = max_bytes - SampleRing.size(raw_capacity, channels) - SampleRing.size(0, summary_channels)
+        summary_capacity = free // (2 * 8 * summary_channels)
+        if summary_capacity < 1:
+            raise ValueError(f'max_bytes ({max_bytes}) is te klein voor {raw_seconds} s aan samples')
+        raw = SampleRing.create(raw_capacity, channels, names, shared=shared)
+        summary = SampleRing.create(summary_capacity, summary_channels, shared=shared)
+        if spill is not None:
+            open(spill, 'wb').close()
+        return cls(raw, summary, bucket_seconds, spill)
+
+    def __getstate__(self):
+        # Alleen de ringbuffers (op naam) en de instellingen; open bestanden en de halve bucket blijven bij de schrijver
+        return (self.raw, self.summary, self.bucket_seconds, self.spill)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    # Zelfde als de ringbuffer met de recente samples
+    def __len__(self):
+        return len(self.raw)
+
+    @property
+    def channels(self):
+        return self.raw.channels
+
+    @property
+    def names(self):
+        return self.raw.names
+
+    @property
+    def index(self):
+        return self.raw.index
+
+    @property
+    def count(self):
+        return self.raw.count
+
+    @property
+    def epoch(self):
+        return self.raw.epoch
+
+    @property
+    def version(self):
+        return self.raw.version
+
+    def last(self, n=None):
+        return self.raw.last(n)
+
+    def window(self, start=None, end=None):
+        return self.raw.window(start, end)
+
+    def batch_times(self, after, upto):
+        return self.raw.batch_times(after, upto)
+
+    def reset(self):
+        '''Gooi alle data weg, ook op schijf (alleen door de schrijver aanroepen)'''
+        self.raw.reset()
+        self.summary.reset()
+        self.pending = np.empty((0, self.channels))
+        if self.spill is not None:
+            self._spill_file().truncate(0)
+            self.spill_file.seek(0)
+
+    def _spill_file(self):
+        if self.spill_file is None:
+            self.spill_file = open(self.spill, 'r+b')
+            self.spill_file.seek(0, os.SEEK_END)
+        return self.spill_file
+
+    def append(self, rows):
+        '''Voeg samples toe (2-D: rijen x kanalen; ontbrekende kanalen worden NaN)'''
+        rows = np.asarray(rows, dtype=np.float64)
+        if rows.ndim == 1:
+            rows = rows.reshape(1, -1)
+        if rows.shape[1] != self.channels:
+            padded = np.full((len(rows), self.channels), np.nan)
+            n = min(rows.shape[1], self.channels)
+            padded[:, :n] = rows[:, :n]
+            rows = padded
+        if len(rows) == 0:
+            return
+        if self.spill is not None:
+            file = self._spill_file()
+            file.write(rows.tobytes())
+            file.flush()
+        self._summarize(rows)
+        self.raw.append(rows)
+
+    def _summarize(self, rows):
+        '''Zet alle buckets die af zijn (er is al een sample van een latere bucket) in de samenvatting'''
+        data = np.concatenate((self.pending, rows))
+        ids = np.floor(data[:, 0] / self.bucket_seconds)
+        done = ids < ids[-1]
+        self.pending = data[~done]
+        if not done.any():
+            return
+        data = data[done]
+        minmax = bucket_rows(data, self.bucket_seconds)
+        mean = bucket_rows(data, self.bucket_seconds, 'mean')
+        self.summary.append(np.column_stack((mean[:, 0], minmax[0::2, 1:], minmax[1::2, 1:], mean[:, 1:])))
+
+    def _spilled(self, start, end):
+        '''Samples van start tot end uit het bestand op schijf (met mmap; alleen wat al helemaal geschreven is)'''
+        rows = os.path.getsize(self.spill) // (8 * self.channels)
+        if rows == 0:
+            return np.empty((0, self.channels))
+        data = np.memmap(self.spill, dtype=np.float64, mode='r', shape=(rows, self.channels))
+        times = data[:, 0]
+        return data[np.searchsorted(times, start, side='left'):np.searchsorted(times, end, side='left')]
+
+    def query(self, start, end, resolution=None, kind='minmax'):
+        '''Data van start tot end met ongeveer resolution seconden per punt (None = zo fijn als beschikbaar)
+
+        Geeft een 2-D array met dezelfde kolommen als append() (tijd + kanalen). Is er meer data dan 2 rijen per
+        resolution, dan wordt die samengevat (kind='minmax': minimum en maximum per stukje, kind='mean': gemiddelde).
+        Recente data komt uit de ringbuffer; daarvoor uit het bestand op schijf (als dat er is en fijner gevraagd wordt
+        dan bucket_seconds), en anders uit de samenvatting.
+        '''
+        recent = self.raw.window(start, end)
+        oldest = self.raw.oldest()
+        oldest = end if oldest is None else oldest # Begin van de recente laag
+        parts = []
+        if start < oldest:
+            older = min(oldest, end)
+            if self.spill is not None and (resolution is None or resolution < self.bucket_seconds):
+                parts.append(self._reduce(self._spilled(start, older), start, end, resolution, kind))
+            else:
+                summary = self.summary.window(start, older)
+                summary = summary[summary[:, 0] < older]
+                parts.append(self._reduce_summary(summary, start, end, resolution, kind))
+        parts.append(self._reduce(recent, start, end, resolution, kind))
+        return np.concatenate(parts) if len(parts) > 1 else parts[0]
+
+    @staticmethod
+    def _reduce(rows, start, end, resolution, kind):
+        if resolution is None or len(rows) <= 2 * (end - start) / resolution:
+            return rows
+        return bucket_rows(rows, resolution, kind)
+
+    def _reduce_summary(self, summary, start, end, resolution, kind):
+        '''Samenvatting (tijd, minima, maxima, gemiddeldes) omzetten naar rijen met de kanalen, op de gevraagde resolutie'''
+        k = self.channels - 1
+        means = np.column_stack((summary[:, 0], summary[:, 1 + 2 * k:]))
+        if kind == 'mean':
+            return self._reduce(means, start, end, max(resolution or 0, self.bucket_seconds), kind)
+        return bucket_rows(means, max(resolution or 0, self.bucket_seconds), mins=summary[:, 1:1 + k], maxs=summary[:, 1 + k:1 + 2 * k])
+
+    def close(self):
+        self.raw.close()
+        self.summary.close()
+        if self.spill_file is not None:
+            self.spill_file.close()
+            self.spill_file = None
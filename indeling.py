@@ -0,0 +1,128 @@
+from lettertypen import CachedText
+
+
+class Layout:
+    '''Declaratieve indeling van een figure in pixels van het ontwerp (standaard 2560x1440)
+
+    Vakken (x, y vanaf linksboven, breedte, hoogte) worden per schermgrootte één keer omgerekend naar figure-coördinaten
+    (0-1) en onthouden. Alle geplaatste assen, teksten en lijnen worden bijgehouden, zodat bij een andere schermgrootte
+    of DPI alleen hun positie, lettergrootte en lijndikte aangepast worden (apply()) in plaats van alles opnieuw op te
+    bouwen. De verhouding van het ontwerp blijft behouden; bij een andere verhouding komt er een lege rand omheen.
+    '''
+
+    def __init__(self, fig, boxes=None, width=2560, height=1440, dpi=100):
+        self.fig = fig
+        self.boxes = dict(boxes or {}) # Naam -> (x, y, breedte, hoogte) of (x, y) in ontwerp-pixels
+        self.width = width
+        self.height = height
+        self.dpi = dpi # DPI waarbij de lettergroottes uit het ontwerp kloppen op een scherm van width x height pixels
+        self.cache = {} # (breedte, hoogte, dpi) van de figure -> omrekening en al omgerekende vakken
+        self.axes = [] # (as, vak)
+        self.texts = [] # (tekst, punt of None, lettergrootte)
+        self.lines = [] # (lijn, lijndikte)
+        self.current = None
+        self.compile()
+
+    def __getitem__(self, name):
+        '''Vak of punt (in ontwerp-pixels) op naam'''
+        return self.boxes[name]
+
+    def compile(self):
+        '''Omrekening voor de huidige grootte van de figure (uit de cache als die grootte al eerder voorkwam)
+
+        Geeft True terug als de grootte veranderd is sinds de vorige keer.
+        '''
+        width, height = self.fig.get_size_inches() * self.fig.dpi
+        key = (round(width), round(height), self.fig.dpi)
+        previous = self.current
+        if key not in self.cache:
+            ratio = min(width / self.width, height / self.height)
+            used_x = self.width * ratio / width # Deel van de figure dat het ontwerp gebruikt
+            used_y = self.height * ratio / height
+            self.cache[key] = {
+                'scale': ratio * self.dpi / self.fig.dpi, # Voor lettergroottes en lijndiktes (in punten)
+                'origin': ((1 - used_x) / 2, (1 - used_y) / 2),
+                'used': (used_x, used_y),
+                'rects': {},
+            }
+            self.current = self.cache[key]
+            for box in self.boxes.values():
+                # Alle vakken uit de beschrijving alvast omrekenen
+                if len(box) == 4:
+                    self.rect(*box)
+                else:
+                    self.point(*box)
+        self.current = self.cache[key]
+        return self.current is not previous
+
+    @property
+    def scale(self):
+        return self.current['scale']
+
+    def rect(self, x, y, w, h):
+        '''Vak in ontwerp-pixels naar figure-coördinaten [links, onder, breedte, hoogte]'''
+        rects = self.current['rects']
+        if (x, y, w, h) not in rects:
+            (left, bottom), (used_x, used_y) = self.current['origin'], self.current['used']
+            rects[(x, y, w, h)] = [
+                left + x / self.width * used_x,
+                bottom + (self.height - y - h) / self.height * used_y, # Y is verkeerd om in Matplotlib
+                w / self.width * used_x,
+                h / self.height * used_y,
+            ]
+        return rects[(x, y, w, h)]
+
+    def point(self, x, y):
+        '''Punt in ontwerp-pixels naar figure-coördinaten (x, y)'''
+        rects = self.current['rects']
+        if (x, y) not in rects:
+            (left, bottom), (used_x, used_y) = self.current['origin'], self.current['used']
+            rects[(x, y)] = (left + x / self.width * used_x, bottom + (self.height - y) / self.height * used_y)
+        return rects[(x, y)]
+
+    def add_axes(self, x, y, w, h):
+        '''Nieuwe as op een vak in ontwerp-pixels'''
+        ax = self.fig.add_axes(self.rect(x, y, w, h))
+        self.axes.append((ax, (x, y, w, h)))
+        return ax
+
+    def text(self, x, y, text, fontsize, cached=False, **kwargs):
+        '''Nieuwe tekst op een punt in ontwerp-pixels, met de lettergrootte uit het ontwerp (cached: als CachedText)'''
+        if cached:
+            label = CachedText(*self.point(x, y), text, fontsize=fontsize * self.scale, transform=self.fig.transSubfigure, **kwargs)
+            self.fig.add_artist(label)
+        else:
+            label = self.fig.text(*self.point(x, y), text, fontsize=fontsize * self.scale, **kwargs)
+        self.texts.append((label, (x, y), fontsize))
+        return label
+
+    def fontsize(self, label, fontsize):
+        '''Lettergrootte uit het ontwerp voor een bestaande tekst (bijv. het label van een knop)'''
+        label.set_fontsize(fontsize * self.scale)
+        self.texts.append((label, None, fontsize))
+        return label
+
+    def linewidth(self, line, linewidth):
+        '''Lijndikte uit het ontwerp voor een bestaande lijn'''
+        line.set_linewidth(linewidth * self.scale)
+        self.lines.append((line, linewidth))
+        return line
+
+    def apply(self, event=None):
+        '''Pas alle geplaatste artists aan aan de huidige grootte van de figure (te gebruiken als resize_event)'''
+        if not self.compile():
+            return
+        for ax, box in self.axes:
+            ax.set_position(self.rect(*box))
+        for label, point, fontsize in self.texts:
+            if point is not None:
+                label.set_position(self.point(*point))
+            label.set_fontsize(fontsize * self.scale)
+        for line, linewidth in self.lines:
+            line.set_linewidth(linewidth * self.scale)
+
+    def clear(self):
+        '''Vergeet alle geplaatste artists (na fig.clear())'''
+        self.axes = []
+        self.texts = []
+        self.lines = []
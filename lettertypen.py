@@ -0,0 +1,178 @@
+import atexit
+import queue
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+import numpy as np
+import matplotlib.colors as mcolors
+from matplotlib import artist
+from matplotlib.backends.backend_agg import RendererAgg
+from matplotlib.figure import Figure
+from matplotlib.font_manager import FontProperties
+from matplotlib.text import Text
+from matplotlib.transforms import IdentityTransform
+
+# De drie meegeleverde stijlen van Montserrat (overeenkomend met ontwerp)
+font_files = {
+    'regular': 'Montserrat-Regular.ttf',
+    'medium': 'Montserrat-Medium.ttf',
+    'bold': 'Montserrat-Bold.ttf',
+}
+_fonts = {}
+
+
+def font(style='regular'):
+    '''FontProperties van een Montserrat-stijl; het bestand wordt maar één keer opgezocht en gedeeld door alle teksten'''
+    if style not in _fonts:
+        _fonts[style] = FontProperties(fname=Path(font_files[style]))
+    return _fonts[style]
+
+
+class TextCache:
+    '''Gerenderde teksten (RGBA bitmaps), met de meest recent gebruikte bovenaan en een maximum aan geheugen'''
+
+    def __init__(self, max_bytes=64 << 20):
+        self.max_bytes = max_bytes
+        self.images = OrderedDict() # (stijl, tekst) -> (bitmap, x-offset, y-offset)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.images.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.images.move_to_end(key)
+            return item
+
+    def put(self, key, item):
+        with self.lock:
+            if key in self.images:
+                return
+            self.images[key] = item
+            self.nbytes += item[0].nbytes
+            while self.nbytes > self.max_bytes and len(self.images) > 1:
+                _, (image, _, _) = self.images.popitem(last=False)
+                self.nbytes -= image.nbytes
+
+    def __contains__(self, key):
+        return key in self.images
+
+
+text_cache = TextCache()
+_warm_queue = queue.Queue() # (stijl, teksten) die nog alvast gerenderd moeten worden
+_warm_thread = None
+_warm_stop = threading.Event()
+
+
+def _warm_worker():
+    '''Render teksten uit de wachtrij, met een korte pauze na elke tekst zodat het tekenen zelf voorrang houdt'''
+    while True:
+        item = _warm_queue.get()
+        if item is None:
+            return
+        style, texts = item
+        for text in texts:
+            if _warm_stop.is_set():
+                return
+            key = CachedText._key(style, text)
+            if key not in text_cache:
+                text_cache.put(key, _render(style, text))
+                time.sleep(0.005)
+
+
+@atexit.register
+def _stop_warming():
+    '''Bij afsluiten niet midden in het renderen stoppen (FreeType kan dat niet hebben)'''
+    _warm_stop.set()
+    if _warm_thread is not None:
+        _warm_queue.put(None)
+        _warm_thread.join()
+
+
+def _render(style, text):
+    '''Render een tekst met een stijl (zie CachedText._style) naar een bitmap, los van de figure (ook vanuit een thread)'''
+    fontproperties, color, alpha, ha, va, antialiased, dpi, frac_x, frac_y = style
+    label = Text(frac_x, frac_y, text, fontproperties=fontproperties, color=color, alpha=alpha,
+                 horizontalalignment=ha, verticalalignment=va, antialiased=antialiased, transform=IdentityTransform())
+    label.set_figure(Figure(dpi=dpi)) # Alleen voor de DPI bij het meten
+    pad = 2
+    bbox = label.get_window_extent(RendererAgg(1, 1, dpi))
+    x0 = np.floor(bbox.x0) - pad
+    y0 = np.floor(bbox.y0) - pad
+    label.set_position((frac_x - x0, frac_y - y0))
+    renderer = RendererAgg(int(np.ceil(bbox.x1 - x0)) + pad, int(np.ceil(bbox.y1 - y0)) + pad, dpi)
+    label.draw(renderer)
+    # Onderste rij eerst, zoals draw_image() van Agg verwacht
+    return np.asarray(renderer.buffer_rgba())[::-1].copy(), x0, y0
+
+
+class CachedText(Text):
+    '''Tekst die elke combinatie van tekst en stijl maar één keer rendert en daarna als bitmap tekent
+
+    Bedoeld voor labels met een vaste set aan teksten (titels, getallen, de timer): na de eerste keer kost tekenen alleen
+    nog het kopiëren van de bitmap. Met warm (lijst met teksten) worden die teksten alvast op de achtergrond gerenderd,
+    steeds als de stijl verandert (bijv. een andere lettergrootte door een andere schermgrootte). Alleen voor Agg;
+    andere renderers (bijv. opslaan als PDF) tekenen gewoon de tekst.
+    '''
+
+    def __init__(self, *args, warm=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.warm = list(warm)
+        self._warmed = set()
+
+    def _style(self, renderer):
+        '''Alles behalve de tekst zelf dat het resultaat bepaalt (None als de tekst niet gecachet kan worden)'''
+        if (not isinstance(renderer, RendererAgg) or self.get_rotation() != 0 or self.get_path_effects()
+                or self.get_bbox_patch() is not None or self.get_usetex()):
+            return None
+        posx, posy = self.get_transform().transform(self.get_unitless_position())
+        fontproperties = self.get_fontproperties().copy()
+        return (fontproperties, mcolors.to_rgba(self.get_color()), self.get_alpha(), self.get_horizontalalignment(),
+                self.get_verticalalignment(), self.get_antialiased(), renderer.dpi, round(posx % 1, 2), round(posy % 1, 2))
+
+    @staticmethod
+    def _key(style, text):
+        fontproperties = style[0]
+        return (str(fontproperties.get_file()), fontproperties.get_size_in_points()) + style[1:] + (text,)
+
+    def prewarm(self, texts, style=None):
+        '''Render teksten alvast in een thread, met de stijl van de laatste keer tekenen (False als er nog niet getekend is)'''
+        global _warm_thread
+        style = style or getattr(self, '_last_style', None)
+        if style is None:
+            return False
+        if _warm_thread is None:
+            _warm_thread = threading.Thread(target=_warm_worker, daemon=True)
+            _warm_thread.start()
+        _warm_queue.put((style, list(texts)))
+        return True
+
+    @artist.allow_rasterization
+    def draw(self, renderer):
+        if not self.get_visible() or self.get_text() == '' or '$' in self.get_text():
+            return super().draw(renderer)
+        style = self._style(renderer)
+        if style is None:
+            return super().draw(renderer)
+        self._last_style = style
+        key = self._key(style, self.get_text())
+        if self.warm and key[:-1] not in self._warmed:
+            self._warmed.add(key[:-1])
+            self.prewarm(self.warm, style)
+        item = text_cache.get(key)
+        if item is None:
+            item = _render(style, self.get_text())
+            text_cache.put(key, item)
+        image, x0, y0 = item
+        posx, posy = self.get_transform().transform(self.get_unitless_position())
+        gc = renderer.new_gc()
+        self._set_gc_clip(gc)
+        renderer.draw_image(gc, round(posx - posx % 1 + x0), round(posy - posy % 1 + y0), image)
+        gc.restore()
+        self.stale = False
@@ -0,0 +1,159 @@
+import numpy as np
+from matplotlib.patches import PathPatch
+from matplotlib.path import Path
+
+
+class LiveLine:
+    '''Lijn (Line2D) met een vooraf gereserveerde array met punten (tijd, waarde), waar nieuwe punten achteraan bij komen
+
+    Er wordt niets opnieuw opgebouwd: nieuwe punten worden in de array geschreven en de lijn krijgt een view tot het
+    laatste punt. Is de array vol, dan worden de punten voor start (trim) naar voren geschoven; dat gebeurt maar eens
+    per capacity punten.
+    '''
+
+    def __init__(self, line, capacity):
+        self.line = line
+        self.points = np.empty((capacity, 2))
+        self.n = 0
+
+    def clear(self):
+        self.n = 0
+        self._update()
+
+    def append(self, times, values, start=None):
+        '''Voeg punten toe; start: oudste tijd die nog nodig is (voor als de array vol raakt)'''
+        times = np.asarray(times, dtype=np.float64)
+        if len(times) == 0:
+            return
+        if self.n + len(times) > len(self.points):
+            self._trim(start, len(times))
+        times, values = times[-len(self.points):], np.asarray(values, dtype=np.float64)[-len(self.points):]
+        n = min(len(times), len(self.points) - self.n)
+        self.points[self.n:self.n + n, 0] = times[:n]
+        self.points[self.n:self.n + n, 1] = values[:n]
+        self.n += n
+        self._update()
+
+    def _trim(self, start, needed):
+        '''Oude punten weggooien (voor start, en in elk geval genoeg voor needed nieuwe punten)'''
+        keep = self.n - np.searchsorted(self.points[:self.n, 0], start, side='left') if start is not None else 0
+        keep = max(min(keep, len(self.points) - needed), 0)
+        self.points[:keep] = self.points[self.n - keep:self.n]
+        self.n = keep
+
+    def _update(self):
+        self.line.set_data(self.points[:self.n, 0], self.points[:self.n, 1])
+
+
+class LiveBand:
+    '''Gevuld vlak tussen een onder- en bovengrens (bijv. een doelbereik), dat net als LiveLine alleen aangevuld wordt
+
+    De hoekpunten staan in één array: de bovengrens achterstevoren vóór het midden, de ondergrens vanaf het midden.
+    Nieuwe punten komen er aan beide kanten bij, zodat het stuk ertussen altijd een gesloten omtrek is (van de nieuwste
+    bovengrens terug naar de oudste, dan de ondergrens weer vooruit) die zonder kopie als Path getekend wordt.
+    Rijen met NaN zijn een gat: daar loopt de ondergrens over de bovengrens heen (twee extra punten aan beide kanten),
+    zodat de omtrek daar heen en terug over dezelfde lijn gaat en er niets gevuld wordt.
+    '''
+
+    def __init__(self, ax, capacity, **kwargs):
+        self.vertices = np.empty((2 * capacity, 2))
+        self.middle = capacity
+        self.n = 0
+        self.last = None # (tijd, bovengrens) van het laatste punt, voor een gat aan het begin van de volgende rijen
+        self.broken = False # NaN na het laatste punt
+        self.patch = PathPatch(Path(self.vertices[:0]), **kwargs)
+        ax.add_patch(self.patch)
+
+    def clear(self):
+        self.n = 0
+        self.last = None
+        self.broken = False
+        self._update()
+
+    def append(self, times, low, high, start=None):
+        '''Voeg punten toe (rijen met NaN zijn een gat in het vlak); start: oudste tijd die nog nodig is'''
+        times, low, high = (np.asarray(values, dtype=np.float64) for values in (times, low, high))
+        missing = np.isnan(times) | np.isnan(low) | np.isnan(high)
+        rows = np.flatnonzero(~missing)
+        if len(rows) == 0:
+            self.broken = self.broken or len(missing) > 0
+            return
+        # Gat voor een punt: NaN tussen het vorige punt (ook uit een eerdere aanroep) en dit punt
+        skipped = np.cumsum(missing)[rows]
+        gaps = np.diff(np.concatenate(([0], skipped))) > 0
+        gaps[0] = self.last is not None and (self.broken or skipped[0] > 0)
+        self.broken = bool(missing[rows[-1] + 1:].any())
+        times, low, high = times[rows], low[rows], high[rows]
+        previous = np.concatenate(([self.last if self.last is not None else (np.nan, np.nan)], np.column_stack((times, high))[:-1]))
+        self.last = (times[-1], high[-1])
+        if gaps.any():
+            # Per gat twee punten met de ondergrens op de bovengrens: het laatste punt ervoor en het eerste erna
+            at = np.repeat(np.flatnonzero(gaps), 2)
+            extra = np.empty((len(at), 2))
+            extra[0::2] = previous[gaps]
+            extra[1::2] = np.column_stack((times, high))[gaps]
+            times = np.insert(times, at, extra[:, 0])
+            high = np.insert(high, at, extra[:, 1])
+            low = np.insert(low, at, extra[:, 1])
+        times, low, high = times[-self.middle:], low[-self.middle:], high[-self.middle:]
+        if self.n + len(times) > self.middle:
+            self._trim(start, len(times))
+        k, m, n = len(times), self.middle, self.n
+        self.vertices[m + n:m + n + k, 0] = times
+        self.vertices[m + n:m + n + k, 1] = low
+        self.vertices[m - n - k:m - n, 0] = times[::-1]
+        self.vertices[m - n - k:m - n, 1] = high[::-1]
+        self.n += k
+        self._update()
+
+    def _trim(self, start, needed):
+        m, n = self.middle, self.n
+        keep = n - np.searchsorted(self.vertices[m:m + n, 0], start, side='left') if start is not None else 0
+        keep = max(min(keep, m - needed), 0)
+        self.vertices[m:m + keep] = self.vertices[m + n - keep:m + n]
+        self.vertices[m - keep:m] = self.vertices[m - n:m - n + keep]
+        self.n = keep
+
+    def _update(self):
+        self.patch.set_path(Path(self.vertices[self.middle - self.n:self.middle + self.n]))
+
+
+class Sparkline:
+    '''Kleine trendlijn met de laatste capacity waardes van een kanaal, op vaste x-posities (0 = oudste, 1 = nieuwste)
+
+    De waardes staan in de array van de Line2D zelf; push() schuift ze in die array op en schrijft de nieuwe erachter,
+    zonder nieuwe arrays per frame. De y-as past zich alleen aan als een waarde buiten het bereik valt (een sparkline
+    heeft geen assen of labels in de achtergrond, dus dat kan gewoon tijdens het blitten).
+    '''
+
+    def __init__(self, ax, capacity=120, **kwargs):
+        self.ax = ax
+        self.line, = ax.plot(np.linspace(0, 1, capacity), np.full(capacity, np.nan), **kwargs)
+        self.values = self.line.get_ydata(orig=True) # Zelfde array als in de lijn
+        ax.set_xlim(0, 1)
+
+    def clear(self):
+        self.values[:] = np.nan
+        self.line.recache_always()
+
+    def push(self, values):
+        '''Voeg nieuwe waardes toe (de oudste vallen er aan de linkerkant af); True als de y-as aangepast is'''
+        values = np.asarray(values, dtype=np.float64)[-len(self.values):]
+        k = len(values)
+        if k == 0:
+            return False
+        self.values[:-k] = self.values[k:]
+        self.values[-k:] = values
+        self.line.recache_always()
+        return self._rescale()
+
+    def _rescale(self):
+        low, high = np.nanmin(self.values, initial=np.inf), np.nanmax(self.values, initial=-np.inf)
+        if not np.isfinite(low):
+            return False
+        bottom, top = self.ax.get_ylim()
+        if bottom <= low and high <= top and top - bottom <= 4 * max(high - low, 1):
+            return False
+        margin = max((high - low) * 0.1, 1)
+        self.ax.set_ylim(low - margin, high + margin)
+        return True
@@ -0,0 +1,132 @@
+import csv
+import json
+import time
+from collections import deque
+import numpy as np
+
+columns = ['time', 'draw_ms', 'latency_ms', 'dropped', 'backlog_s']
+
+
+class Metrics:
+    '''Meet de keten van inlezen tot scherm
+
+    Per getekend frame: de teken-tijd, de vertraging van de nieuw getoonde batches (van schrijven in de ringbuffer tot
+    ze op het scherm staan), het aantal gemiste frames sinds het vorige frame en de achterstand van het inlezen
+    (hoe ver de nieuwste sample van de eerste gevolgde buffer achterloopt op de afspeelklok).
+    Alleen als enabled (of na enable()) wordt er gemeten. In het geheugen blijven de laatste history frames; met
+    stream() gaat elke rij ook meteen naar een bestand, zodat een lange sessie helemaal vastgelegd wordt zonder dat het
+    geheugen groeit.
+    '''
+
+    def __init__(self, interval, clock=None, history=15000, enabled=True):
+        self.interval = interval # Gewenste tijd tussen frames (ms)
+        self.clock = clock
+        self.enabled = enabled
+        self.sources = [] # Per gevolgde ringbuffer: [buffer, laatst getekende count, epoch]
+        self.frames = deque(maxlen=history) # Per getekend frame een rij met waardes voor columns (alleen de laatste)
+        self.stream_file = None # Bestand waar elke rij meteen in komt (stream())
+        self.writer = None
+        self.last_tick = None
+        self.dropped = 0 # Gemiste frames sinds het laatst getekende frame
+        self.counts = []
+
+    def track(self, ring):
+        '''Volg een ringbuffer (vertraging van zijn batches en achterstand)'''
+        self.sources.append([ring, ring.count, ring.epoch])
+
+    def enable(self):
+        '''Begin met meten; wat er al in de buffers stond telt niet mee als vertraging'''
+        for source in self.sources:
+            source[1], source[2] = source[0].count, source[0].epoch
+        self.last_tick = None
+        self.dropped = 0
+        self.enabled = True
+
+    def stream(self, filename):
+        '''Schrijf vanaf nu elke rij meteen naar een CSV bestand (tab-gescheiden, zoals de exports)'''
+        self.stream_file = open(filename, 'w', newline='')
+        self.writer = csv.writer(self.stream_file, delimiter='\t')
+        self.writer.writerow(columns)
+
+    def tick(self):
+        '''Begin van een tick: gemiste frames tellen en onthouden wat er op dit moment in de buffers staat'''
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.last_tick is not None:
+            gap = (now - self.last_tick) * 1000
+            if gap > 1.5 * self.interval:
+                self.dropped += int(gap // self.interval) - 1
+        self.last_tick = now
+        self.counts = [(source[0].epoch, source[0].count) for source in self.sources]
+
+    def frame(self, draw_ms):
+        '''Na het tekenen van een frame: vertraging van de nieuw getoonde batches en achterstand vastleggen'''
+        if not self.enabled:
+            return
+        shown = time.time()
+        latencies = []
+        for source, (epoch, count) in zip(self.sources, self.counts):
+            ring, drawn, drawn_epoch = source
+            if epoch != drawn_epoch:
+                # Buffer is leeggemaakt (bijv. na zoeken)
+                drawn = 0
+            latencies += list((shown - ring.batch_times(drawn, count)) * 1000)
+            source[1] = count
+            source[2] = epoch
+        backlog = np.nan
+        if self.clock is not None and len(self.sources) > 0 and len(self.sources[0][0]) > 0:
+            backlog = max(self.clock.now() - self.sources[0][0].last(1)[0, 0], 0)
+        row = (shown, draw_ms, max(latencies) if len(latencies) > 0 else np.nan, self.dropped, backlog)
+        self.frames.append(row)
+        if self.writer is not None:
+            self.writer.writerow(row)
+        self.dropped = 0
+
+    def summary(self, last=None):
+        '''Samenvatting (gemiddelde, p95, max) van de bewaarde frames, of alleen van de laatste frames'''
+        frames = list(self.frames)
+        frames = np.array(frames[-last:] if last else frames, dtype=np.float64).reshape(-1, len(columns))
+        result = {'frames': len(frames), 'dropped': int(frames[:, 3].sum()) if len(frames) > 0 else 0}
+        for i, name in ((1, 'draw_ms'), (2, 'latency_ms'), (4, 'backlog_s')):
+            values = frames[:, i][~np.isnan(frames[:, i])]
+            if len(values) > 0:
+                result[name] = {'mean': float(values.mean()), 'p95': float(np.percentile(values, 95)), 'max': float(values.max())}
+        return result
+
+    def text(self, last=25):
+        '''Korte tekst voor op het scherm (over de laatste frames)'''
+        summary = self.summary(last)
+        parts = []
+        if 'draw_ms' in summary:
+            parts.append(f"tekenen {summary['draw_ms']['mean']:.1f} ms")
+        if 'latency_ms' in summary:
+            parts.append(f"vertraging {summary['latency_ms']['mean']:.0f} ms (max {summary['latency_ms']['max']:.0f})")
+        parts.append(f"gemist {summary['dropped']}")
+        if 'backlog_s' in summary:
+            parts.append(f"achterstand {summary['backlog_s']['mean']:.2f} s")
+        return ' | '.join(parts)
+
+    def close(self):
+        '''Sluit het bestand van stream()'''
+        if self.stream_file is not None:
+            self.stream_file.close()
+            self.stream_file = None
+            self.writer = None
+
+    def dump(self, filename):
+        '''Schrijf de bewaarde metingen weg; .json met samenvatting, anders als CSV (tab-gescheiden, zoals de exports)
+
+        Wordt er al naar dit bestand gestreamd (stream()), dan staat alles er al in en wordt het alleen afgesloten.
+        '''
+        if self.stream_file is not None and self.stream_file.name == str(filename):
+            self.close()
+            return
+        if str(filename).endswith('.json'):
+            with open(filename, 'w') as file:
+                json.dump({'summary': self.summary(), 'columns': columns, 'frames': [[None if value != value else value for value in frame] for frame in self.frames]}, file, indent=1)
+            return
+        with open(filename, 'w', newline='') as file:
+            writer = csv.writer(file, delimiter='\t')
+            writer.writerow(columns)
+            writer.writerows(self.frames)
@@ -0,0 +1,142 @@
+import queue
+import threading
+import time
+import cv2 as cv
+import videoindex
+
+
+class Recorder:
+    '''Webcam-opname met aparte stappen voor opnemen, wegschrijven (encoderen) en tonen, elk in een eigen thread
+
+    De stappen zijn verbonden met begrensde wachtrijen. Opnemen wacht nooit: is de wachtrij naar de encoder vol, dan
+    wordt het frame overgeslagen en geteld (dropped); het voorbeeld krijgt alleen het nieuwste frame. Elk frame krijgt
+    bij het opnemen een tijd (time.monotonic, vanaf het eerste frame) en de kloktijd (time.time); die komen per
+    weggeschreven frame in een apart bestand (videoindex.times_file(), tab-gescheiden zoals de exports), zodat de video
+    op het frame nauwkeurig naast de monitordata gelegd kan worden; na het stoppen wordt daar de index van gemaakt
+    (videoindex.build(), met de keyframes om snel te kunnen zoeken). De fps van het bestand is de gemeten snelheid van
+    de camera over de eerste measure_seconds, niet een vast getal (begrensd op max_fps: bij een veel hogere fps slaat
+    de muxer frames over, en dan klopt het bestand met tijden niet meer). Een videobestand als bron wordt op zijn eigen
+    fps gelezen, net als een camera, en niet zo snel als het gedecodeerd kan worden.
+    '''
+
+    def __init__(self, filename='filename.avi', source=0, fourcc='MJPG', queue_seconds=2, measure_seconds=1, max_fps=120):
+        self.filename = filename
+        self.source = source
+        self.fourcc = fourcc
+        self.queue_seconds = queue_seconds # Zo veel seconden aan frames mag de encoder achterlopen
+        self.measure_seconds = measure_seconds
+        self.max_fps = max_fps
+        self.captured = 0 # Frames van de camera
+        self.written = 0 # Frames in het bestand
+        self.dropped = 0 # Overgeslagen omdat de encoder achterliep
+        self.max_backlog = 0 # Grootste aantal frames dat op de encoder wachtte
+        self.fps = None # Gemeten snelheid van de camera (na measure_seconds)
+        self.started = None # time.monotonic() van het eerste frame
+        self.last = None # ... en van het laatste
+        self.stopping = threading.Event()
+        self.preview = queue.Queue(maxsize=1)
+
+    @property
+    def running(self):
+        return self.capture_thread.is_alive() or self.encode_thread.is_alive()
+
+    def start(self):
+        self.capture = cv.VideoCapture(self.source)
+        if not self.capture.isOpened():
+            raise OSError(f'Kan camera/video {self.source} niet openen')
+        self.size = (int(self.capture.get(cv.CAP_PROP_FRAME_WIDTH)), int(self.capture.get(cv.CAP_PROP_FRAME_HEIGHT)))
+        expected = self.capture.get(cv.CAP_PROP_FPS)
+        expected = expected if 0 < expected <= self.max_fps else 30 # Voor de grootte van de wachtrij (en het tempo van een bestand)
+        self.pace = expected if type(self.source) == str else None # Bestand: frames op hun eigen fps lezen
+        self.frames = queue.Queue(maxsize=max(int(expected * self.queue_seconds), 1))
+        self.capture_thread = threading.Thread(target=self._capture, daemon=True)
+        self.encode_thread = threading.Thread(target=self._encode, daemon=True)
+        self.encode_thread.start()
+        self.capture_thread.start()
+
+    def _capture(self):
+        '''Thread: frames van de camera halen, een tijd geven en doorgeven (zonder ooit te wachten op de andere stappen)'''
+        try:
+            while not self.stopping.is_set():
+                if self.pace is not None and self.started is not None:
+                    wait = self.started + self.captured / self.pace - time.monotonic()
+                    if wait > 0 and self.stopping.wait(wait):
+                        break
+                ok, frame = self.capture.read()
+                now = time.monotonic()
+                if not ok:
+                    break
+                if self.started is None:
+                    self.started = now
+                self.last = now
+                item = (now - self.started, time.time(), frame)
+                self.captured += 1
+                try:
+                    self.frames.put_nowait(item)
+                except queue.Full:
+                    self.dropped += 1
+                self.max_backlog = max(self.max_backlog, self.frames.qsize())
+                try:
+                    self.preview.get_nowait() # Oud voorbeeld weggooien
+                except queue.Empty:
+                    pass
+                self.preview.put_nowait(frame)
+        finally:
+            self.capture.release()
+            # Einde voor de encoder (die leegt de wachtrij); niet blijven wachten als de encoder er niet meer is
+            while self.encode_thread.is_alive():
+                try:
+                    self.frames.put(None, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+
+    def _encode(self):
+        '''Thread: frames wegschrijven, met per frame een regel in het bestand met tijden'''
+        waiting = [] # Frames van de eerste measure_seconds (voor het meten van de snelheid)
+        writer = None
+        with open(videoindex.times_file(self.filename), 'w') as index:
+            index.write('Frame\tTime\tClock\n')
+            while True:
+                item = self.frames.get()
+                if writer is not None:
+                    pending = [item] if item is not None else []
+                else:
+                    if item is not None:
+                        waiting.append(item)
+                        if item[0] - waiting[0][0] < self.measure_seconds:
+                            continue
+                    if len(waiting) == 0:
+                        break
+                    span = waiting[-1][0] - waiting[0][0]
+                    self.fps = min((len(waiting) - 1) / span, self.max_fps) if span > 0 else 30
+                    writer = cv.VideoWriter(str(self.filename), cv.VideoWriter_fourcc(*self.fourcc), self.fps, self.size)
+                    pending = waiting
+                for session_time, clock, frame in pending:
+                    writer.write(frame)
+                    index.write(f'{self.written}\t{session_time:.6f}\t{clock:.6f}\n')
+                    self.written += 1
+                if item is None:
+                    break
+        if writer is not None:
+            writer.release()
+            videoindex.build(self.filename)
+
+    def preview_frame(self):
+        '''Nieuwste frame voor het voorbeeld (None als er sinds de vorige keer geen nieuw frame is)'''
+        try:
+            return self.preview.get_nowait()
+        except queue.Empty:
+            return None
+
+    def stop(self):
+        '''Stop met opnemen; wacht tot de encoder alles wat al opgenomen is heeft weggeschreven (en de index gemaakt is)'''
+        self.stopping.set()
+        self.capture_thread.join()
+        self.encode_thread.join()
+
+    def stats(self):
+        '''Tellers: opgenomen, weggeschreven en overgeslagen frames, grootste achterstand, fps van het bestand en gemeten'''
+        seconds = self.last - self.started if self.started is not None else 0
+        return {'captured': self.captured, 'written': self.written, 'dropped': self.dropped, 'max_backlog': self.max_backlog,
+                'fps': self.fps, 'real_fps': (self.captured - 1) / seconds if seconds > 0 else 0.0}
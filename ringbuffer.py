@@ -0,0 +1,194 @@
+import threading
+import time
+import numpy as np
+from contextlib import nullcontext
+from multiprocessing import shared_memory
+
+# Plaatsen in de header (int64) aan het begin van het gedeelde geheugen
+HEADER_COUNT = 0 # Totaal aantal geschreven samples (sequence counter, alleen de schrijver verhoogt deze)
+HEADER_EPOCH = 1 # Verhoogd bij elke reset(), zodat lezers weten dat oude data weg is
+HEADER_BATCHES = 2 # Aantal keer dat append() aangeroepen is
+HEADER_WRITING = 3 # Teller tot waar de schrijver bezig is (gezet vóór het schrijven, HEADER_COUNT pas erna)
+HEADER_SIZE = 8
+STAMPS = 64 # Aantal batches waarvan bewaard wordt wanneer ze geschreven zijn (voor het meten van de vertraging)
+
+
+class SampleRing:
+    '''Ringbuffer met vaste capaciteit voor samples (float64, meerdere kanalen) in gedeeld geheugen
+
+    Eén schrijver (het inlees-proces) en meerdere lezers (bijv. de grafieken), zonder lock (seqlock): de schrijver zet
+    eerst HEADER_WRITING op de nieuwe teller, schrijft dan de data en verhoogt daarna pas HEADER_COUNT. Lezers kopiëren
+    alleen het stuk dat ze nodig hebben en controleren daarna of de schrijver intussen over dat stuk heen geschreven kan
+    hebben; zo ja, dan lezen ze opnieuw. Wat last() en window() teruggeven blijft dus geldig, hoe vaak er daarna ook
+    geschreven wordt. Elke sample staat twee keer in het geheugen (op i en i + capacity), zodat elk venster van
+    maximaal capacity samples aaneengesloten is en met één kopie gelezen wordt.
+    Kanaal 0 is de tijd (oplopend), waarmee op tijd gezocht wordt. Optioneel hebben de kanalen namen (zie index).
+    Met shared=False staat de buffer gewoon in het eigen proces (voor inlezen in een thread), beschermd met een lock.
+    '''
+
+    def __init__(self, capacity, channels, names=None, shm=None, owner=False):
+        self.shm = shm
+        self.capacity = capacity
+        self.channels = channels
+        self.names = names
+        self.owner = owner
+        buffer = shm.buf if shm is not None else bytearray(SampleRing.size(capacity, channels))
+        self.lock = nullcontext() if shm is not None else threading.Lock()
+        self.header = np.ndarray((HEADER_SIZE,), dtype=np.int64, buffer=buffer)
+        # Per batch: aantal samples na die batch en het tijdstip van schrijven (time.time())
+        self.stamps = np.ndarray((STAMPS, 2), dtype=np.float64, buffer=buffer, offset=HEADER_SIZE * 8)
+        self.data = np.ndarray((2 * capacity, channels), dtype=np.float64, buffer=buffer, offset=(HEADER_SIZE + 2 * STAMPS) * 8)
+
+    @staticmethod
+    def size(capacity, channels):
+        '''Benodigd geheugen in bytes'''
+        return (HEADER_SIZE + 2 * STAMPS + 2 * capacity * channels) * 8
+
+    @classmethod
+    def create(cls, capacity, channels, names=None, shared=True):
+        '''Maak een nieuwe (lege) ringbuffer aan, standaard in gedeeld geheugen (channels: aantal kanalen of een lijst met namen)'''
+        if type(channels) != int:
+            names = list(channels)
+            channels = len(names)
+        if shared:
+            shm = shared_memory.SharedMemory(create=True, size=SampleRing.size(capacity, channels))
+            ring = cls(capacity, channels, names, shm, owner=True)
+        else:
+            ring = cls(capacity, channels, names)
+        ring.header[:] = 0
+        ring.stamps[:] = -1
+        return ring
+
+    @classmethod
+    def attach(cls, name, capacity, channels, names=None):
+        '''Koppel aan een bestaande ringbuffer (bijv. in een ander proces)'''
+        return cls(capacity, channels, names, shared_memory.SharedMemory(name=name))
+
+    def __getstate__(self):
+        # Bij doorgeven aan een Process alleen de naam meesturen, daar wordt opnieuw gekoppeld
+        return (self.shm.name, self.capacity, self.channels, self.names)
+
+    def __setstate__(self, state):
+        ring = SampleRing.attach(*state)
+        self.__dict__.update(ring.__dict__)
+
+    def __len__(self):
+        return min(int(self.header[HEADER_COUNT]), self.capacity)
+
+    @property
+    def index(self):
+        '''Kanaalnaam -> kanaalnummer'''
+        return {name: i for i, name in enumerate(self.names or [])}
+
+    @property
+    def count(self):
+        '''Totaal aantal samples dat ooit geschreven is'''
+        return int(self.header[HEADER_COUNT])
+
+    @property
+    def epoch(self):
+        return int(self.header[HEADER_EPOCH])
+
+    @property
+    def version(self):
+        '''Verandert bij elke append() en reset(); om te zien of er iets opnieuw getekend moet worden'''
+        return (self.epoch, self.count)
+
+    def reset(self):
+        '''Gooi alle data weg (alleen door de schrijver aanroepen)'''
+        with self.lock:
+            self.header[HEADER_COUNT] = 0
+            self.header[HEADER_WRITING] = 0
+            self.header[HEADER_EPOCH] += 1
+            self.stamps[:] = -1
+
+    def append(self, rows):
+        '''Voeg samples toe (2-D: rijen x kanalen; ontbrekende kanalen worden NaN)'''
+        rows = np.asarray(rows, dtype=np.float64)
+        if rows.ndim == 1:
+            rows = rows.reshape(1, -1)
+        if rows.shape[1] != self.channels:
+            padded = np.full((len(rows), self.channels), np.nan)
+            n = min(rows.shape[1], self.channels)
+            padded[:, :n] = rows[:, :n]
+            rows = padded
+        rows = rows[-self.capacity:]
+        with self.lock:
+            count = self.count
+            # Eerst aankondigen tot waar geschreven wordt, zodat lezers weten welke oude samples overschreven kunnen zijn
+            self.header[HEADER_WRITING] = count + len(rows)
+            done = 0
+            while done < len(rows):
+                i = (count + done) % self.capacity
+                n = min(len(rows) - done, self.capacity - i)
+                self.data[i:i + n] = rows[done:done + n]
+                self.data[i + self.capacity:i + self.capacity + n] = rows[done:done + n]
+                done += n
+            batch = self.header[HEADER_BATCHES]
+            self.stamps[batch % STAMPS] = (count + len(rows), time.time())
+            # Pas na het schrijven publiceren, zodat lezers nooit halve data zien
+            self.header[HEADER_COUNT] = count + len(rows)
+            self.header[HEADER_BATCHES] = batch + 1
+
+    def _intact(self, epoch, first):
+        '''Staan sample nummer first en alles erna nog ongewijzigd in de buffer (na het kopiëren gecontroleerd)'''
+        return self.epoch == epoch and int(self.header[HEADER_WRITING]) - self.capacity <= first
+
+    def last(self, n=None):
+        '''Kopie van de laatste n samples (standaard: alles wat in de buffer staat)'''
+        while True:
+            with self.lock:
+                epoch, count = self.epoch, self.count
+                available = min(count, self.capacity)
+                k = available if n is None else min(n, available)
+                start = (count - k) % self.capacity
+                rows = self.data[start:start + k].copy()
+                if self._intact(epoch, count - k):
+                    return rows
+
+    def oldest(self):
+        '''Tijd van de oudste sample in de buffer (None als die leeg is)'''
+        while True:
+            with self.lock:
+                epoch, count = self.epoch, self.count
+                if count == 0:
+                    return None
+                available = min(count, self.capacity)
+                oldest = float(self.data[(count - available) % self.capacity, 0])
+                if self._intact(epoch, count - available):
+                    return oldest
+
+    def batch_times(self, after, upto):
+        '''Tijdstippen (time.time()) waarop de batches met samples na nummer after, tot en met upto, geschreven zijn'''
+        counts = self.stamps[:, 0]
+        return self.stamps[(counts > after) & (counts <= upto), 1]
+
+    def window(self, start=None, end=None):
+        '''Kopie van de samples met start <= tijd <= end (None = geen grens)
+
+        Er wordt gezocht in de buffer zelf en alleen het gevonden stuk gekopieerd. Zocht de zoekactie in samples die
+        intussen overschreven zijn, dan valt dat stuk ook binnen de kopie (nieuwere tijden sturen het zoeken naar links)
+        en wordt er opnieuw gelezen.
+        '''
+        while True:
+            with self.lock:
+                epoch, count = self.epoch, self.count
+                available = min(count, self.capacity)
+                first = (count - available) % self.capacity
+                data = self.data[first:first + available]
+                times = data[:, 0]
+                i = 0 if start is None else int(np.searchsorted(times, start, side='left'))
+                j = available if end is None else int(np.searchsorted(times, end, side='right'))
+                rows = data[i:max(i, j)].copy()
+                if self._intact(epoch, count - available + i):
+                    return rows
+
+    def close(self):
+        '''Ontkoppel van het gedeelde geheugen (eigenaar ruimt het daarna ook op)'''
+        self.header = None
+        self.data = None
+        if self.shm is None:
+            return
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
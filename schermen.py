@@ -0,0 +1,52 @@
+class Screens:
+    '''Meerdere schermen in één figure, die elk maar één keer opgebouwd worden
+
+    Alles wat tijdens build() aan de figure toegevoegd wordt (assen, teksten, knoppen en de update-functies in de
+    Scheduler) hoort bij dat scherm en blijft bestaan. Wisselen van scherm (show()) zet alleen de zichtbaarheid om en
+    gebruikt de bewaarde achtergrond van dat scherm, zodat het in een paar milliseconden gaat en de timer (en dus de
+    animatie) gewoon doorloopt.
+    '''
+
+    def __init__(self, fig, scheduler):
+        self.fig = fig
+        self.scheduler = scheduler
+        self.screens = {} # Naam -> artists (assen en teksten) van dat scherm
+        self.widgets = {} # Naam -> widgets (knoppen) van dat scherm
+        self.building = None # Scherm dat nu opgebouwd wordt
+        self.current = None
+
+    def build(self, name, draw, *args):
+        '''Bouw een scherm op met draw(*args)'''
+        axes = set(self.fig.axes)
+        texts = set(self.fig.texts + self.fig.artists)
+        self.building = name
+        self.widgets[name] = []
+        self.scheduler.group = name
+        try:
+            draw(*args)
+        finally:
+            self.building = None
+            self.scheduler.group = None
+        self.screens[name] = [ax for ax in self.fig.axes if ax not in axes] + [text for text in self.fig.texts + self.fig.artists if text not in texts]
+        if name != self.current:
+            self._set_visible(name, False)
+
+    def widget(self, widget):
+        '''Widget (bijv. een knop) van het scherm dat nu opgebouwd wordt; werkt alleen als dat scherm getoond wordt'''
+        if self.building is not None:
+            self.widgets[self.building].append(widget)
+        return widget
+
+    def _set_visible(self, name, visible):
+        for artist in self.screens[name]:
+            artist.set_visible(visible)
+        for widget in self.widgets[name]:
+            widget.set_active(visible)
+
+    def show(self, name):
+        '''Toon een ander scherm (met een volledige redraw alleen als dat scherm nog nooit getekend is)'''
+        for screen in self.screens:
+            self._set_visible(screen, screen == name)
+        self.current = name
+        if not self.scheduler.show(name):
+            self.fig.canvas.draw_idle()
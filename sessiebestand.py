@@ -0,0 +1,153 @@
+import json
+import sys
+import numpy as np
+from pathlib import Path
+from datalezer import CsvTail, load_array
+
+# Opbouw van een sessiebestand (.ses):
+#   8 bytes "magic", 8 bytes lengte van de header, JSON header (kolomnamen, types, posities), en daarna per kolom
+#   een aaneengesloten array (uitgelijnd op 64 bytes), zodat elke kolom direct met mmap gelezen kan worden
+MAGIC = b'PMPLSES1'
+ALIGN = 64
+
+
+def _align(position):
+    return -(-position // ALIGN) * ALIGN
+
+
+def read_text(filename, delimiter='\t'):
+    '''Lees een tab-gescheiden export in; geeft kolomnamen en een 2-D float array terug'''
+    index, data = load_array(filename, delimiter)
+    return list(index), data
+
+
+def write(filename, names, data, dtype='float32', source=None):
+    '''Schrijf kolommen naar een sessiebestand (de tijd, kolom 0, altijd als float64)
+
+    dtype: type van de andere kolommen, of een lijst met een type per kolom (na de tijd)
+    '''
+    dtypes = dtype if type(dtype) == list else [dtype] * (len(names) - 1)
+    columns = []
+    arrays = []
+    for i, name in enumerate(names):
+        array = np.ascontiguousarray(data[:, i], dtype=np.float64 if i == 0 else dtypes[i - 1])
+        columns.append({'name': name, 'dtype': array.dtype.str})
+        arrays.append(array)
+    # Posities uitrekenen; de posities staan zelf ook in de header, dus herhalen tot de header past
+    header = {'version': 1, 'rows': len(data), 'source': source, 'columns': columns}
+    header_size = ALIGN
+    while True:
+        position = header_size
+        for column, array in zip(columns, arrays):
+            column['offset'] = position
+            position = _align(position + array.nbytes)
+        encoded = json.dumps(header).encode()
+        if len(MAGIC) + 8 + len(encoded) <= header_size:
+            break
+        header_size = _align(len(MAGIC) + 8 + len(encoded))
+    with open(filename, 'wb') as file:
+        file.write(MAGIC)
+        file.write(len(encoded).to_bytes(8, 'little'))
+        file.write(encoded)
+        for column, array in zip(columns, arrays):
+            file.seek(column['offset'])
+            file.write(array.tobytes())
+        file.truncate(max(position, header_size))
+
+
+def convert(filename, output=None, delimiter='\t', dtype='float32'):
+    '''Zet een tab-gescheiden export (.xls) eenmalig om naar een sessiebestand (.ses)'''
+    output = Path(filename).with_suffix('.ses') if output is None else Path(output)
+    names, data = read_text(filename, delimiter)
+    write(output, names, data, dtype, source=Path(filename).name)
+    return output
+
+
+class SessionFile:
+    '''Sessiebestand dat met mmap geopend is: elke kolom is een NumPy array zonder dat er iets ingelezen wordt'''
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.raw = np.memmap(filename, dtype=np.uint8, mode='r')
+        if bytes(self.raw[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f'{filename} is geen sessiebestand')
+        length = int.from_bytes(bytes(self.raw[len(MAGIC):len(MAGIC) + 8]), 'little')
+        start = len(MAGIC) + 8
+        self.meta = json.loads(bytes(self.raw[start:start + length]))
+        self.rows = self.meta['rows']
+        self.names = [column['name'] for column in self.meta['columns']]
+        self.index = {name: i for i, name in enumerate(self.names)} # Kolomnaam -> kolomnummer
+        self.columns = []
+        for column in self.meta['columns']:
+            dtype = np.dtype(column['dtype'])
+            offset = column['offset']
+            self.columns.append(self.raw[offset:offset + self.rows * dtype.itemsize].view(dtype))
+
+    @property
+    def time(self):
+        return self.columns[0]
+
+    def __getitem__(self, key):
+        '''Kolom op naam of nummer'''
+        return self.columns[self.index[key] if type(key) == str else key]
+
+    def window(self, start=None, end=None):
+        '''Rij-bereik (slice) met start <= tijd < end'''
+        i = 0 if start is None else np.searchsorted(self.time, start, side='left')
+        j = self.rows if end is None else np.searchsorted(self.time, end, side='left')
+        return slice(i, j)
+
+
+def load(filename):
+    '''Open een sessiebestand (met mmap; vrijwel direct, ongeacht de grootte)'''
+    return SessionFile(filename)
+
+
+class SessionTail:
+    '''Leest een sessiebestand stukje bij beetje, net als datalezer.CsvTail (read_array, seek, reset)
+
+    Voor het afspelen van een opname: er wordt niets geparsed, read_array() kopieert alleen de nieuwe rijen uit de
+    kolommen (mmap) en seek() zoekt direct op tijd, dus een opname van uren is meteen klaar om af te spelen.
+    '''
+
+    def __init__(self, filename):
+        self.session = load(filename)
+        self.headers = self.session.names
+        self.columns = len(self.headers)
+        self.position = 0 # Eerste rij die nog niet gelezen is
+
+    def reset(self):
+        '''Begin opnieuw vanaf het begin'''
+        self.position = 0
+
+    def seek(self, session_time):
+        '''Lees verder vanaf de eerste rij met tijd >= session_time'''
+        self.position = int(np.searchsorted(self.session.time, session_time, side='left'))
+
+    def read_array(self, start=0, end=-1):
+        '''Nieuwe rijen met start <= tijd < end (end < 0: geen eindtijd) als 2-D float array, zoals CsvTail.read_array()'''
+        stop = self.session.rows if end < 0 else int(np.searchsorted(self.session.time, end, side='left'))
+        stop = max(stop, self.position)
+        rows = np.column_stack([column[self.position:stop] for column in self.session.columns]).astype(np.float64)
+        self.position = stop
+        times = rows[:, 0]
+        return rows[times >= start] if start >= 0 else rows[~np.isnan(times)]
+
+
+def open_tail(filename, time_col=0, delimiter='\t'):
+    '''Lezer voor een export: het sessiebestand ernaast (.ses) als dat er is en niet ouder is dan de export, anders CsvTail
+
+    Een export die nog groeit (live opname) is nieuwer dan het sessiebestand en wordt dus gewoon gevolgd als tekst.
+    '''
+    session = Path(filename).with_suffix('.ses')
+    if session.exists() and (not Path(filename).exists() or session.stat().st_mtime >= Path(filename).stat().st_mtime):
+        return SessionTail(session)
+    return CsvTail(filename, delimiter, time_col)
+
+
+# Omzetten vanaf de command line: python sessiebestand.py 2__pressureandflow.xls 2__monitordata.xls
+if __name__ == '__main__':
+    for filename in sys.argv[1:]:
+        output = convert(filename)
+        session = load(output)
+        print(f'{filename} -> {output} ({session.rows} rijen, {len(session.names)} kolommen)')
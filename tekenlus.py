@@ -0,0 +1,123 @@
+import time
+from collections import deque
+
+
+class Scheduler:
+    '''Eén timer voor alle animaties van een figure, met blitting
+
+    De statische delen (achtergrondblokken, referentielijnen, labels bij de assen, niet-bewegende grafieken) worden één
+    keer volledig getekend en als achtergrond bewaard. Per frame wordt alleen die achtergrond teruggezet en worden de
+    bewegende artists (lijnen, timer, waardes) er opnieuw overheen getekend.
+    Elke update-functie geeft een lijst terug met de artists die veranderd zijn; als niets veranderd is wordt er niet getekend.
+    Update-functies en artists horen bij een groep (scherm): groep None wordt altijd getekend, van de andere groepen
+    alleen het getoonde scherm. Per scherm wordt een eigen achtergrond bewaard, zodat wisselen (show()) geen volledige
+    redraw nodig heeft als dat scherm al eens getekend is.
+    '''
+
+    def __init__(self, fig, interval, target=None, metrics=None):
+        self.fig = fig
+        self.canvas = fig.canvas
+        self.interval = interval # Gewenste tijd tussen frames (ms)
+        self.target = target if target is not None else interval # Doel voor de teken-tijd per frame (ms)
+        self.groups = {} # Groep -> (update-functies, artists)
+        self.group = None # Groep waar add() aan toevoegt
+        self.screen = None # Getoonde groep (naast groep None)
+        self.backgrounds = {} # Bewaarde achtergrond per getoonde groep
+        self.frame_times = deque(maxlen=50) # Laatst gemeten teken-tijden (ms)
+        self.metrics = metrics # Optioneel: meting.Metrics voor vertraging, gemiste frames en achterstand
+        self.timer = self.canvas.new_timer(interval=interval)
+        self.timer.add_callback(self.tick)
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+        self.canvas.mpl_connect('resize_event', self._on_resize)
+
+    def add(self, update, artists):
+        '''Registreer een update-functie en de artists die daardoor kunnen veranderen (in de groep self.group)'''
+        updates, group_artists = self.groups.setdefault(self.group, ([], []))
+        for artist in artists:
+            artist.set_animated(True) # Niet meetekenen in de achtergrond
+            group_artists.append(artist)
+        updates.append(update)
+
+    def clear(self):
+        '''Vergeet alle update-functies en artists (bijv. na fig.clear())'''
+        self.groups = {}
+        self.group = None
+        self.screen = None
+        self.backgrounds = {}
+
+    def _active(self):
+        '''Update-functies en artists van groep None en het getoonde scherm'''
+        updates = []
+        artists = []
+        for group in (None, self.screen) if self.screen is not None else (None,):
+            group_updates, group_artists = self.groups.get(group, ([], []))
+            updates += group_updates
+            artists += group_artists
+        return updates, artists
+
+    def show(self, screen):
+        '''Wissel naar een ander scherm; True als dat met de bewaarde achtergrond kon (anders is een redraw nodig)'''
+        self.screen = screen
+        if screen not in self.backgrounds:
+            return False
+        updates, artists = self._active()
+        for update in updates:
+            update(None)
+        self._blit(artists)
+        return True
+
+    def start(self):
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    def _on_draw(self, event):
+        '''Na een volledige redraw: nieuwe achtergrond bewaren en bewegende artists er weer overheen tekenen'''
+        self.backgrounds[self.screen] = self.canvas.copy_from_bbox(self.fig.bbox)
+        for artist in self._active()[1]:
+            if artist.get_visible():
+                self.fig.draw_artist(artist)
+
+    def _on_resize(self, event):
+        '''Andere grootte: alle bewaarde achtergronden zijn niet meer bruikbaar'''
+        self.backgrounds = {}
+
+    def _blit(self, artists):
+        '''Achtergrond van het getoonde scherm terugzetten en de bewegende artists er overheen tekenen'''
+        self.canvas.restore_region(self.backgrounds[self.screen])
+        for artist in artists:
+            if artist.get_visible():
+                self.fig.draw_artist(artist)
+        self.canvas.blit(self.fig.bbox)
+
+    def tick(self):
+        '''Eén frame: alle updates uitvoeren en alleen tekenen wat veranderd is'''
+        if self.screen not in self.backgrounds:
+            # Nog geen volledige redraw geweest
+            return
+        started = time.perf_counter()
+        if self.metrics is not None:
+            self.metrics.tick()
+        updates, artists = self._active()
+        dirty = []
+        for update in updates:
+            dirty += update(None) or []
+        if len(dirty) == 0:
+            return
+        self._blit(artists)
+        self.frame_times.append((time.perf_counter() - started) * 1000)
+        if self.metrics is not None:
+            self.metrics.frame(self.frame_times[-1])
+        self._adjust_interval()
+
+    def frame_time(self):
+        '''Gemiddelde teken-tijd van de laatste frames (ms)'''
+        return sum(self.frame_times) / len(self.frame_times) if len(self.frame_times) > 0 else 0
+
+    def _adjust_interval(self):
+        '''Als tekenen langer duurt dan het doel, de timer wat laten afremmen (en weer versnellen als het kan)'''
+        frame_time = self.frame_time()
+        interval = int(frame_time * 1.2) if frame_time > self.target else self.interval
+        if interval != self.timer.interval:
+            self.timer.interval = interval
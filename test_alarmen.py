@@ -0,0 +1,46 @@
+import numpy as np
+from alarmen import AlarmRule, AlarmEngine
+
+names = ['Time', 'SpO2', 'SpO2 Low Target', 'PEEP']
+rules = [
+    AlarmRule('SpO2 laag', 'SpO2', 'SpO2 Low Target', 'low', 1, 2),
+    AlarmRule('PEEP laag', 'PEEP', 4, 'low', 0.5, 2),
+]
+
+
+def rows(times, spo2, target, peep):
+    '''Monitordata met één rij per tijd'''
+    n = len(times)
+    return np.column_stack((times, np.broadcast_to(spo2, n), np.broadcast_to(target, n), np.broadcast_to(peep, n))).astype(float)
+
+
+def test_zero_rows_raise_nothing():
+    '''Rijen met 0 (geen meting) zetten geen alarm aan, ook niet na de debounce'''
+    engine = AlarmEngine(rules, names)
+    changes = engine.process(rows(np.arange(60), 0, 88, 0))
+    assert len(changes) == 0
+    assert not engine.active.any()
+
+
+def test_zero_target_raises_nothing():
+    '''Een grens van 0 uit de monitordata is ook geen meting'''
+    engine = AlarmEngine(rules, names)
+    assert len(engine.process(rows(np.arange(10), 95, 0, 5))) == 0
+
+
+def test_low_value_raises_after_debounce():
+    engine = AlarmEngine(rules, names)
+    changes = engine.process(rows(np.arange(10), 80, 88, 5))
+    assert changes.tolist() == [[2, 1, 0]]
+
+
+def test_zero_and_nan_rows_keep_alarm():
+    '''Zonder meting blijft een actief alarm aan (niet uit door 0 of NaN), een goede meting zet het uit'''
+    engine = AlarmEngine(rules, names)
+    engine.process(rows(np.arange(5), 80, 88, 5))
+    assert engine.active.tolist() == [True, False]
+    assert len(engine.process(rows(np.arange(5, 10), 0, 88, 5))) == 0
+    assert len(engine.process(rows(np.arange(10, 15), np.nan, 88, 5))) == 0
+    assert engine.active.tolist() == [True, False]
+    changes = engine.process(rows([15], 95, 88, 5))
+    assert changes.tolist() == [[15, 0, 0]]
@@ -0,0 +1,93 @@
+import time
+import numpy as np
+from multiprocessing import Process, Event
+from ringbuffer import SampleRing, HEADER_WRITING
+
+capacity = 256
+
+
+def rows(first, n):
+    '''Samples first .. first + n - 1: tijd = volgnummer, de andere kanalen zijn daaruit te controleren'''
+    numbers = np.arange(first, first + n, dtype=np.float64)
+    return np.column_stack((numbers, 2 * numbers, -numbers))
+
+
+def consistent(data):
+    '''Kloppen de rijen (geen halve of overschreven rijen) en zijn ze aaneengesloten?'''
+    return (np.array_equal(data[:, 1], 2 * data[:, 0]) and np.array_equal(data[:, 2], -data[:, 0])
+            and np.all(np.diff(data[:, 0]) == 1))
+
+
+def write(ring, started, stop, seconds=2.0):
+    '''Proces: schrijft batches van wisselende grootte (soms over het einde van de buffer heen) tot stop'''
+    count = 0
+    batch = 0
+    started.set()
+    deadline = time.monotonic() + seconds
+    while not stop.is_set() and time.monotonic() < deadline:
+        n = 1 + batch % 97
+        ring.append(rows(count, n))
+        count += n
+        batch += 1
+
+
+def test_mirrored_storage_is_contiguous():
+    '''Na het rondgaan staat elk venster van maximaal capacity samples aaneengesloten (één kopie)'''
+    ring = SampleRing.create(capacity, ['Time', 'a', 'b'], shared=False)
+    ring.append(rows(0, 200))
+    ring.append(rows(200, 200)) # Over het einde van de buffer heen
+    assert ring.count == 400 and len(ring) == capacity
+    assert np.array_equal(ring.last(), rows(400 - capacity, capacity))
+    assert np.array_equal(ring.last(10), rows(390, 10))
+    assert np.array_equal(ring.window(300, 320), rows(300, 21))
+    assert ring.oldest() == 400 - capacity
+    ring.close()
+
+
+def test_copies_survive_later_writes():
+    '''last() en window() geven kopieën: later schrijven verandert ze niet meer'''
+    ring = SampleRing.create(capacity, ['Time', 'a', 'b'], shared=False)
+    ring.append(rows(0, 100))
+    last, window = ring.last(50), ring.window(10, 20)
+    ring.append(rows(100, 3 * capacity))
+    assert np.array_equal(last, rows(50, 50))
+    assert np.array_equal(window, rows(10, 11))
+    ring.close()
+
+
+def test_read_during_write_is_detected():
+    '''Een aangekondigde schrijfactie over het gelezen stuk heen maakt een kopie ongeldig (sequence counter)'''
+    ring = SampleRing.create(capacity, ['Time', 'a', 'b'], shared=False)
+    ring.append(rows(0, capacity))
+    assert ring._intact(ring.epoch, 0)
+    ring.header[HEADER_WRITING] = capacity + 10 # Schrijver bezig met 10 nieuwe samples (over sample 0-9 heen)
+    assert not ring._intact(ring.epoch, 0)
+    assert ring._intact(ring.epoch, 10)
+    ring.header[HEADER_WRITING] = capacity
+    ring.reset()
+    assert not ring._intact(ring.epoch - 1, 0) # Na reset() is alles van de vorige epoch ongeldig
+    ring.close()
+
+
+def test_no_torn_reads_with_writer_process():
+    '''Stresstest: een ander proces schrijft zo snel mogelijk, ondertussen mag geen enkele kopie halve rijen bevatten'''
+    ring = SampleRing.create(capacity, ['Time', 'a', 'b'])
+    started, stop = Event(), Event()
+    writer = Process(target=write, args=(ring, started, stop))
+    writer.start()
+    try:
+        started.wait(10)
+        reads = 0
+        while writer.is_alive():
+            last = ring.last(capacity // 2)
+            count = ring.count
+            window = ring.window(count - capacity // 2, count - capacity // 4) if count > 0 else rows(0, 0)
+            time.sleep(0) # Kans voor de schrijver om verder te gaan voor de kopieën gecontroleerd worden
+            assert consistent(last), last
+            assert consistent(window), window
+            reads += 1
+        assert reads > 100
+    finally:
+        stop.set()
+        writer.join()
+        ring.close()
@@ -0,0 +1,246 @@
+import sys
+import time
+import numpy as np
+import cv2 as cv
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.ticker import FuncFormatter
+from datalezer import CsvTail, parse_block, read_headers
+from lettertypen import font
+import videoindex
+
+# Overzicht van een hele sessie in één PNG: miniaturen van de video met daaronder druk, flow en SpO2.
+# Vanaf de command line: python tijdlijn.py --video filename.avi --output tijdlijn.png [--offset s] [--width px]
+#   [--thumbnails n]; zonder (leesbare) video alleen de grafieken.
+pressure_file = '2__pressureandflow.xls'
+monitor_file = '2__monitordata.xls'
+
+# Strips onder de miniaturen: (titel, bestand, kolom, kleur); kolommen van de monitordata op naam
+strips = [
+    ('Druk', 'pressure', 1, '#f30170'),
+    ('Flow', 'pressure', 2, '#000000'),
+    ('SpO2', 'monitor', 'SpO2', '#00a5da'),
+]
+# Doelbereik bij een strip (ondergrens, bovengrens), als band erachter
+bands = {'SpO2': ('SpO2 Low Target', 'SpO2 High Target')}
+
+
+def last_time(filename, delimiter='\t', max_bytes=1 << 16):
+    '''Tijd (eerste kolom) van de laatste rij van een export, zonder het hele bestand te lezen'''
+    with open(filename, 'rb') as file:
+        file.seek(0, 2)
+        size = file.tell()
+        file.seek(max(size - max_bytes, 0))
+        data = file.read()
+    if size > max_bytes:
+        data = data[data.find(b'\n') + 1:] # Eerste (halve) regel overslaan
+    times = parse_block(data, None, delimiter)[:, 0] if len(data) > 0 else np.empty(0)
+    return float(np.nanmax(times)) if np.any(~np.isnan(times)) else 0.0
+
+
+class MinMaxStrip:
+    '''Minimum en maximum van een kanaal per pixelkolom over de hele sessie, aangevuld per stuk data
+
+    De tijd bepaalt de kolom, dus het geheugen is 2 x pixels, hoe lang de sessie ook is en hoe de rijen ook over de
+    stukken verdeeld zijn. Liggen de samples verder uit elkaar dan een kolom (monitordata: 1 per seconde), dan wordt
+    elke waarde vastgehouden tot het volgende sample; kolommen verder dan anderhalve keer de gewone afstand tussen de
+    samples van de vorige waarde blijven NaN (een gat in de strip).
+    '''
+
+    def __init__(self, start, end, pixels):
+        self.start = start
+        self.scale = pixels / max(end - start, 1e-9) # Pixelkolommen per seconde
+        self.low = np.full(pixels, np.inf)
+        self.high = np.full(pixels, -np.inf)
+        self.last = np.nan # Tijd van de laatste geldige waarde
+        self.spacing = np.inf # Gewone afstand tussen de samples (kleinste mediaan van de stukken)
+
+    @property
+    def times(self):
+        '''Tijd in het midden van elke kolom'''
+        return self.start + (np.arange(len(self.low)) + 0.5) / self.scale
+
+    def add(self, times, values):
+        '''Nieuwe rijen (tijd oplopend) verwerken'''
+        times = np.asarray(times, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        columns = np.floor((times - self.start) * self.scale)
+        valid = ~np.isnan(values) & (columns >= 0) & (columns < len(self.low))
+        steps = np.diff(np.concatenate(([self.last], times[valid])))
+        steps = steps[steps > 0]
+        if len(steps) > 0:
+            self.spacing = min(self.spacing, float(np.median(steps)))
+            self.last = times[valid][-1]
+        columns, values = columns[valid].astype(np.intp), values[valid]
+        if len(columns) == 0:
+            return
+        # Per kolom één keer min/max (reduceat over de stukken met dezelfde kolom)
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(columns)) + 1))
+        used = columns[starts]
+        self.low[used] = np.minimum(self.low[used], np.minimum.reduceat(values, starts))
+        self.high[used] = np.maximum(self.high[used], np.maximum.reduceat(values, starts))
+
+    def envelope(self):
+        '''(minimum, maximum) per kolom, NaN waar geen data is (lege kolommen tussen twee samples: de vorige waarde)'''
+        empty = self.low > self.high
+        low, high = np.where(empty, np.nan, self.low), np.where(empty, np.nan, self.high)
+        reach = int(1.5 * self.spacing * self.scale) if np.isfinite(self.spacing) else 0 # Kolommen vasthouden
+        if reach > 0:
+            columns = np.arange(len(low))
+            previous = np.maximum.accumulate(np.where(empty, -1, columns)) # Laatste kolom met data
+            hold = empty & (previous >= 0) & (columns - previous <= reach)
+            low[hold], high[hold] = low[previous[hold]], high[previous[hold]]
+        return low, high
+
+
+class Timeline:
+    '''Tijdlijn van een hele sessie: thumbnails miniaturen van de video op vaste afstanden en de strips eronder
+
+    Eén keer van begin tot eind door de sessie, in stukken van step seconden: per stuk de nieuwe rijen uit de exports
+    (CsvTail, in stukken gelezen) in de strips, en de miniaturen die in dat stuk vallen: het keyframe het dichtst bij dat
+    moment (via de index, zonder de frames ertussen te decoderen), meteen verkleind in één vooraf gereserveerde array.
+    Het geheugen hangt dus alleen af van de grootte van de afbeelding en van step, niet van de lengte van de sessie.
+    width: breedte van de strips in pixels (één kolom per pixel).
+    '''
+
+    def __init__(self, video_file=None, pressure_file=pressure_file, monitor_file=monitor_file, offset=0, width=1920,
+                 thumbnails=16, step=60):
+        self.pressure_file = pressure_file
+        self.monitor_file = monitor_file
+        self.width = width
+        self.thumbnails = thumbnails
+        self.step = step
+        self.reader = videoindex.FrameReader(video_file, offset) if video_file is not None else None
+        ends = [last_time(pressure_file), last_time(monitor_file)]
+        if self.reader is not None and len(self.reader.index) > 0:
+            ends.append(self.reader.index.time(len(self.reader.index) - 1))
+        self.start = min(offset, 0) if self.reader is not None else 0.0
+        self.end = max(ends + [self.start + 1])
+        self.strips = {title: MinMaxStrip(self.start, self.end, width) for title, _, _, _ in strips}
+        self.bands = {title: (MinMaxStrip(self.start, self.end, width), MinMaxStrip(self.start, self.end, width))
+                      for title in bands}
+        # Miniaturen naast elkaar in één RGB array, elk thumb_width breed; zonder video blijft die leeg
+        self.thumb_width = width // thumbnails
+        if self.reader is not None:
+            capture = self.reader.capture
+            aspect = capture.get(cv.CAP_PROP_FRAME_HEIGHT) / max(capture.get(cv.CAP_PROP_FRAME_WIDTH), 1)
+            self.thumb_height = max(round(self.thumb_width * aspect), 1)
+        else:
+            self.thumb_height = 0
+        self.thumbs = np.full((self.thumb_height, self.thumb_width * thumbnails, 3), 64, np.uint8)
+        self.thumb_times = np.full(thumbnails, np.nan) # Sessietijd van het frame in elke miniatuur
+
+    def run(self):
+        '''Loop de hele sessie één keer door; geeft aantallen en de tijd die het kostte'''
+        started = time.perf_counter()
+        sources = {'pressure': CsvTail(self.pressure_file), 'monitor': CsvTail(self.monitor_file, time_col='Time')}
+        columns = {'pressure': {}, 'monitor': {name: i for i, name in enumerate(read_headers(self.monitor_file))}}
+        slot = (self.end - self.start) / self.thumbnails
+        wanted = self.start + (np.arange(self.thumbnails) + 0.5) * slot # Midden van elk vak
+        rows = 0
+        k = 0
+        position = self.start
+        while position < self.end:
+            position = min(position + self.step, self.end)
+            last = position >= self.end
+            for name, tail in sources.items():
+                data = tail.read_array(end=-1 if last else position)
+                rows += len(data)
+                if len(data) == 0:
+                    continue
+                if name == 'monitor':
+                    data[:, 1:] = np.where(data[:, 1:] != 0, data[:, 1:], np.nan) # 0 = geen meting
+                for title, source, column, _ in strips:
+                    if source == name:
+                        self.strips[title].add(data[:, 0], data[:, columns[name].get(column, column)])
+                        if title in bands and all(limit in columns[name] for limit in bands[title]):
+                            for strip, limit in zip(self.bands[title], bands[title]):
+                                strip.add(data[:, 0], data[:, columns[name][limit]])
+            while k < self.thumbnails and (wanted[k] < position or last):
+                self._thumbnail(k, wanted[k])
+                k += 1
+        if self.reader is not None:
+            self.reader.close()
+        return {'rows': rows, 'thumbnails': int(np.sum(~np.isnan(self.thumb_times))), 'seconds': time.perf_counter() - started}
+
+    def _thumbnail(self, k, session_time):
+        '''Miniatuur k: het keyframe het dichtst bij session_time (niets als de video dan niet loopt)'''
+        if self.reader is None or len(self.reader.index) == 0:
+            return
+        index = self.reader.index
+        if not index.time(0) <= session_time <= index.time(len(index) - 1):
+            return
+        i = index.nearest_keyframe(session_time)
+        frame = self.reader.frame(i)
+        if frame is None:
+            return
+        small = cv.resize(frame, (self.thumb_width, self.thumb_height), interpolation=cv.INTER_AREA)
+        self.thumbs[:, k * self.thumb_width:(k + 1) * self.thumb_width] = small[:, :, ::-1] # BGR -> RGB
+        self.thumb_times[k] = index.time(i)
+
+    def figure(self, strip_height=120, dpi=100):
+        '''Figure (Agg, zonder pyplot) met de miniaturen en strips; de strips zijn precies width pixels breed'''
+        left, right, top, bottom, gap = 60, 20, 30, 30, 25 # Marges in pixels
+        heights = ([self.thumb_height] if self.thumb_height > 0 else []) + [strip_height] * len(strips)
+        fig_width = left + self.width + right
+        fig_height = top + sum(heights) + gap * (len(heights) - 1) + bottom
+        fig = Figure(figsize=(fig_width / dpi, fig_height / dpi), dpi=dpi)
+        FigureCanvasAgg(fig)
+        montserrat = font('regular')
+        y = fig_height - top
+        axes = []
+        for height in heights:
+            y -= height
+            axes.append(fig.add_axes([left / fig_width, y / fig_height, self.width / fig_width, height / fig_height]))
+            y -= gap
+        for ax in axes:
+            ax.set_xlim(self.start, self.end)
+            ax.xaxis.set_tick_params(labelbottom=False, length=0)
+            ax.yaxis.set_tick_params(labelsize=8, length=0)
+            for spine in ('top', 'right'):
+                ax.spines[spine].set_visible(False)
+        if self.thumb_height > 0:
+            ax = axes.pop(0)
+            ax.imshow(self.thumbs, extent=(self.start, self.end, 0, 1), aspect='auto', interpolation='nearest')
+            ax.set_ylim(0, 1)
+            ax.set_yticks([])
+            ax.set_title('Video', loc='left', font=montserrat, fontsize=10)
+            for t in self.thumb_times[~np.isnan(self.thumb_times)]:
+                ax.axvline(t, color='#ffffff', linewidth=0.5, alpha=0.6) # Tijd van het getoonde frame
+        for ax, (title, _, _, color) in zip(axes, strips):
+            strip = self.strips[title]
+            low, high = strip.envelope()
+            if title in bands:
+                band_low, _ = self.bands[title][0].envelope()
+                _, band_high = self.bands[title][1].envelope()
+                ax.fill_between(strip.times, band_low, band_high, step='mid', color=color, alpha=0.15, linewidth=0)
+            ax.fill_between(strip.times, low, high, step='mid', color=color, linewidth=0.5, edgecolor=color)
+            if np.any(~np.isnan(low)):
+                margin = max((np.nanmax(high) - np.nanmin(low)) * 0.05, 1)
+                ax.set_ylim(np.nanmin(low) - margin, np.nanmax(high) + margin)
+            ax.set_title(title, loc='left', font=montserrat, fontsize=10, color=color)
+        axes[-1].xaxis.set_tick_params(labelbottom=True, labelsize=8, length=3)
+        axes[-1].xaxis.set_major_formatter(FuncFormatter(lambda t, _: f'{int(t // 60):02d}:{int(t % 60):02d}'))
+        return fig
+
+    def save(self, filename, **kwargs):
+        '''Tijdlijn opslaan als PNG'''
+        self.figure(**kwargs).savefig(filename)
+
+
+if __name__ == '__main__':
+    video_file = sys.argv[sys.argv.index('--video') + 1] if '--video' in sys.argv else 'filename.avi' # Bestand gegenereerd door 3_2webcamvideo.py
+    output_file = sys.argv[sys.argv.index('--output') + 1] if '--output' in sys.argv else 'tijdlijn.png'
+    offset = float(sys.argv[sys.argv.index('--offset') + 1]) if '--offset' in sys.argv else 0 # Sessietijd van het eerste videoframe
+    width = int(sys.argv[sys.argv.index('--width') + 1]) if '--width' in sys.argv else 1920
+    thumbnails = int(sys.argv[sys.argv.index('--thumbnails') + 1]) if '--thumbnails' in sys.argv else 16
+    started = time.perf_counter()
+    try:
+        timeline = Timeline(video_file, offset=offset, width=width, thumbnails=thumbnails)
+    except OSError as error:
+        print(error, '(alleen de grafieken)')
+        timeline = Timeline(None, width=width, thumbnails=thumbnails)
+    stats = timeline.run()
+    timeline.save(output_file)
+    print(f"{output_file}: {stats['thumbnails']} miniaturen, {stats['rows']} rijen data, "
+          f"{timeline.end - timeline.start:.0f} s sessie, in {time.perf_counter() - started:.2f} s")
@@ -0,0 +1,176 @@
+import sys
+import time
+import numpy as np
+import cv2 as cv
+from pathlib import Path
+import sessiebestand
+
+# Index bij een video (filename.avi -> filename.frames.ses, een sessiebestand dat met mmap geopend wordt):
+#   per frame de sessietijd (Time), de kloktijd van de opname (Clock, NaN als die onbekend is) en het nummer van het
+#   keyframe waar het decoderen voor dat frame moet beginnen (Keyframe). Het framenummer is het rijnummer.
+# De Recorder schrijft tijdens het opnemen eerst een tekstbestand met de tijden (filename.frames.xls, blijft bruikbaar
+# als de opname afgebroken wordt) en maakt daar bij het stoppen de index van; build() doet dat ook voor bestaande video's.
+
+
+def times_file(video_file):
+    '''Tekstbestand met de gemeten tijden van de frames (Frame, Time, Clock), geschreven door de Recorder'''
+    return Path(video_file).with_suffix('.frames.xls')
+
+
+def index_file(video_file):
+    '''Index van de video (sessiebestand met Time, Clock en Keyframe per frame)'''
+    return Path(video_file).with_suffix('.frames.ses')
+
+
+def scan(video_file):
+    '''Loop alle pakketten van de video door zonder te decoderen: tijd volgens het bestand en keyframe ja/nee per frame'''
+    capture = cv.VideoCapture(str(video_file))
+    if not capture.isOpened():
+        raise OSError(f'Kan video {video_file} niet openen')
+    raw = capture.set(cv.CAP_PROP_FORMAT, -1) # Ruwe pakketten: grab() decodeert dan niets
+    times = []
+    keys = []
+    while capture.grab():
+        times.append(capture.get(cv.CAP_PROP_POS_MSEC) / 1000)
+        keys.append(capture.get(cv.CAP_PROP_LRF_HAS_KEY_FRAME) != 0 if raw else True)
+    capture.release()
+    keys = np.array(keys, dtype=bool)
+    if len(keys) > 0:
+        keys[0] = True # Het eerste frame is altijd een beginpunt
+    return np.array(times, dtype=np.float64), keys
+
+
+def build(video_file):
+    '''(Her)bouw de index: tijden uit het bestand van de Recorder (als dat er is, anders uit de video), keyframes uit de video'''
+    times, keys = scan(video_file)
+    clocks = np.full(len(times), np.nan)
+    if times_file(video_file).exists():
+        measured = np.loadtxt(times_file(video_file), delimiter='\t', skiprows=1, ndmin=2)
+        n = min(len(measured), len(times))
+        if n > 0:
+            # Meer frames dan gemeten tijden (afgebroken opname): de rest met de afstanden uit de video erachter
+            times[n:] = measured[n - 1, 1] + times[n:] - times[n - 1]
+            times[:n] = measured[:n, 1]
+            clocks[:n] = measured[:n, 2]
+    keyframes = np.maximum.accumulate(np.where(keys, np.arange(len(keys)), 0))
+    output = index_file(video_file)
+    sessiebestand.write(output, ['Time', 'Clock', 'Keyframe'], np.column_stack((times, clocks, keyframes)),
+                        dtype=['float64', 'int32'], source=Path(video_file).name)
+    return output
+
+
+class FrameIndex:
+    '''Index van een video: framenummer <-> sessietijd, en het keyframe waar het decoderen van een frame begint'''
+
+    def __init__(self, video_file, offset=0):
+        session = sessiebestand.load(index_file(video_file))
+        self.offset = offset # Sessietijd van het begin van de opname
+        self.times = session['Time']
+        self.clocks = session['Clock']
+        self.keyframes = session['Keyframe']
+        self.keys = np.flatnonzero(self.keyframes == np.arange(len(self.keyframes))) # Nummers van de keyframes
+
+    def __len__(self):
+        return len(self.times)
+
+    def time(self, index):
+        '''Sessietijd van frame index'''
+        return self.offset + float(self.times[index])
+
+    def frame(self, session_time):
+        '''Nummer van het frame dat op session_time in beeld is (-1 als de video dan nog niet begonnen is)'''
+        return int(np.searchsorted(self.times, session_time - self.offset, side='right')) - 1
+
+    def keyframe(self, index):
+        '''Keyframe waar het decoderen voor frame index begint'''
+        return int(self.keyframes[index])
+
+    def nearest_keyframe(self, session_time):
+        '''Keyframe het dichtst bij session_time (snel te lezen, bijv. voor miniaturen)'''
+        i = np.searchsorted(self.times[self.keys], session_time - self.offset)
+        candidates = self.keys[max(i - 1, 0):i + 1]
+        return int(candidates[np.argmin(np.abs(self.times[candidates] - (session_time - self.offset)))])
+
+
+def load(video_file, offset=0):
+    '''Index van een video; wordt (opnieuw) gebouwd als die er nog niet is of ouder is dan de video of de tijden'''
+    output = index_file(video_file)
+    sources = [Path(video_file), times_file(video_file)]
+    if not output.exists() or any(source.exists() and source.stat().st_mtime > output.stat().st_mtime for source in sources):
+        build(video_file)
+    return FrameIndex(video_file, offset)
+
+
+class FrameReader:
+    '''Leest frames op nummer of sessietijd uit een video, met de index om niet vanaf het begin te hoeven decoderen
+
+    Voor een frame verderop wordt naar het keyframe ervoor gesprongen en vanaf daar gedecodeerd; ligt de huidige positie
+    al tussen dat keyframe en het frame, dan wordt gewoon doorgelezen (doorlezen is dan goedkoper dan springen).
+    position: nummer van het frame dat read() als volgende geeft.
+    '''
+
+    def __init__(self, video_file, offset=0, index=None):
+        self.index = index if index is not None else load(video_file, offset)
+        self.capture = cv.VideoCapture(str(video_file))
+        if not self.capture.isOpened():
+            raise OSError(f'Kan video {video_file} niet openen')
+        self.position = 0
+        self.seeks = 0 # Aantal sprongen naar een keyframe
+        self.skipped = 0 # Frames die alleen gedecodeerd zijn om bij het gevraagde frame te komen
+
+    def seek(self, index):
+        '''Zet de positie op frame index, via het keyframe ervoor als doorlezen niet kan'''
+        index = min(max(index, 0), len(self.index))
+        if index < len(self.index):
+            key = self.index.keyframe(index)
+            if not key <= self.position <= index:
+                self.capture.set(cv.CAP_PROP_POS_FRAMES, key)
+                self.position = key
+                self.seeks += 1
+        while self.position < index:
+            self.skipped += 1
+            if not self.grab():
+                return False
+        return True
+
+    def grab(self):
+        '''Sla het volgende frame over (False aan het einde van de video)'''
+        if not self.capture.grab():
+            self.position = len(self.index)
+            return False
+        self.position += 1
+        return True
+
+    def read(self, frame=None):
+        '''Volgende frame (BGR array), of None aan het einde van de video; frame: array om in te lezen (hergebruik)'''
+        ok, frame = self.capture.read(frame)
+        if not ok:
+            self.position = len(self.index)
+            return None
+        self.position += 1
+        return frame
+
+    def frame(self, index):
+        '''Frame index (BGR array), of None als het niet gelezen kan worden'''
+        if not 0 <= index < len(self.index) or not self.seek(index):
+            return None
+        return self.read()
+
+    def frame_at(self, session_time):
+        '''(framenummer, BGR array) op session_time'''
+        index = self.index.frame(session_time)
+        return index, self.frame(index)
+
+    def close(self):
+        self.capture.release()
+
+
+# Index (opnieuw) maken vanaf de command line: python videoindex.py filename.avi
+if __name__ == '__main__':
+    for filename in sys.argv[1:]:
+        start = time.perf_counter()
+        build(filename)
+        index = FrameIndex(filename)
+        seconds = index.times[-1] if len(index) > 0 else 0
+        print(f'{filename} -> {index_file(filename)} ({len(index)} frames, {len(index.keys)} keyframes, '
+              f'{seconds:.1f} s video, in {time.perf_counter() - start:.2f} s)')
@@ -0,0 +1,194 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import cv2 as cv
+from matplotlib import artist
+from videoindex import FrameReader
+
+
+class FrameCache:
+    '''Gedecodeerde frames (framenummer -> array), met de meest recent gebruikte bovenaan en een maximum aan geheugen'''
+
+    def __init__(self, max_bytes=256 << 20):
+        self.max_bytes = max_bytes
+        self.frames = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, index):
+        with self.lock:
+            frame = self.frames.get(index)
+            if frame is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.frames.move_to_end(index)
+            return frame
+
+    def put(self, index, frame):
+        with self.lock:
+            if index in self.frames:
+                return
+            self.frames[index] = frame
+            self.nbytes += frame.nbytes
+            while self.nbytes > self.max_bytes and len(self.frames) > 1:
+                _, old = self.frames.popitem(last=False)
+                self.nbytes -= old.nbytes
+
+    def __contains__(self, index):
+        return index in self.frames
+
+    def clear(self):
+        with self.lock:
+            self.frames.clear()
+            self.nbytes = 0
+
+
+class VideoSource:
+    '''Video (bijv. de webcam-opname van 3_2webcamvideo.py) als frames op sessietijd, voor afspelen en zoeken
+
+    Een thread leest vanaf het gevraagde frame read_ahead frames vooruit (opeenvolgend lezen is veel sneller dan zoeken)
+    en zet ze in een FrameCache; frames die al in de cache staan worden alleen overgeslagen (grab, niet decoderen).
+    Voor een sprong gebruikt de thread de index van de video (videoindex.FrameReader: naar het keyframe ervoor en vanaf
+    daar decoderen). frame_at() haalt een frame uit de cache en wacht hooguit wait seconden als het er nog niet is,
+    zodat de tekenlus niet blijft hangen op het decoderen. times: sessietijd van elk frame volgens de index (de gemeten
+    tijden van de Recorder, of anders de tijden in de video), plus offset.
+    Met set_size() maakt de thread de frames meteen op schermgrootte, als RGBA met de onderste rij eerst (zoals
+    draw_image() van Agg verwacht), zodat tekenen alleen nog kopiëren is (zie FrameArtist).
+    '''
+
+    def __init__(self, filename, offset=0, cache_bytes=256 << 20, read_ahead=50):
+        self.filename = filename
+        self.reader = FrameReader(filename, offset)
+        capture = self.reader.capture
+        self.fps = capture.get(cv.CAP_PROP_FPS) or 25
+        self.frame_count = len(self.reader.index)
+        self.width = int(capture.get(cv.CAP_PROP_FRAME_WIDTH))
+        self.height = int(capture.get(cv.CAP_PROP_FRAME_HEIGHT))
+        self.times = offset + self.reader.index.times
+        self.cache = FrameCache(cache_bytes)
+        self.read_ahead = read_ahead
+        self.size = None # (breedte, hoogte) op het scherm; None = RGB op de originele grootte
+        self.wanted = None # Laatst gevraagde frame
+        self.unreadable = set() # Gevraagde frames waarbij het lezen mislukte (niet steeds opnieuw proberen)
+        self.stopped = False
+        self.changed = threading.Condition()
+        self.thread = threading.Thread(target=self._reader, daemon=True)
+        self.thread.start()
+
+    @property
+    def duration(self):
+        return self.frame_count / self.fps
+
+    def index(self, session_time):
+        '''Nummer van het frame dat op session_time in beeld is (-1 als de video dan nog niet begonnen is)'''
+        return self.reader.index.frame(session_time)
+
+    def frame_at(self, session_time, wait=0.02):
+        '''(framenummer, RGB array) op session_time; array is None als het frame (nog) niet gedecodeerd is'''
+        index = min(self.index(session_time), self.frame_count - 1)
+        if index < 0:
+            return index, None
+        return index, self.frame(index, wait)
+
+    def frame(self, index, wait=0.02):
+        '''Frame index (RGB array) uit de cache; zo nodig vraagt dit het aan de thread en wacht hooguit wait seconden'''
+        with self.changed:
+            if self.wanted != index:
+                self.wanted = index
+                self.changed.notify_all()
+        frame = self.cache.get(index)
+        if frame is None and wait > 0:
+            with self.changed:
+                self.changed.wait_for(lambda: index in self.cache or self.stopped, timeout=wait)
+            frame = self.cache.get(index)
+        return frame
+
+    def _reader(self):
+        '''Thread: lees frames vanaf het gevraagde frame tot read_ahead frames verder'''
+        while True:
+            with self.changed:
+                self.changed.wait_for(lambda: self.stopped or (self.wanted is not None and self._behind()))
+                if self.stopped:
+                    return
+                wanted = self.wanted
+            reader = self.reader
+            if not wanted <= reader.position <= wanted + self.read_ahead or (wanted not in self.cache and reader.position != wanted):
+                # Te ver weg, terug in de tijd, of het gevraagde frame is uit de cache: naar het frame (via de index)
+                reader.seek(wanted)
+            position = reader.position
+            if position >= self.frame_count:
+                ok = False
+            elif position in self.cache:
+                ok = reader.grab()
+            else:
+                frame = reader.read()
+                ok = frame is not None
+                if ok:
+                    self.cache.put(position, self._convert(frame))
+            with self.changed:
+                if not ok:
+                    # Einde van het bestand (of een kapot frame): voor dit gevraagde frame niet blijven proberen
+                    self.unreadable.add(wanted)
+                self.changed.notify_all()
+
+    def set_size(self, width, height):
+        '''Lever de frames voortaan op deze grootte in pixels (de cache wordt geleegd)'''
+        with self.changed:
+            self.size = (max(int(width), 1), max(int(height), 1))
+            self.cache.clear()
+            self.changed.notify_all()
+
+    def _convert(self, frame):
+        '''BGR frame uit OpenCV -> RGB, of op schermgrootte: RGBA met de onderste rij eerst'''
+        size = self.size
+        if size is None:
+            return cv.cvtColor(frame, cv.COLOR_BGR2RGB)
+        frame = cv.resize(frame, size, interpolation=cv.INTER_AREA)
+        return np.ascontiguousarray(cv.cvtColor(frame, cv.COLOR_BGR2RGBA)[::-1])
+
+    def _behind(self):
+        '''Moet de thread nog lezen: het gevraagde frame of de frames erna staan nog niet in de cache'''
+        end = min(self.wanted + self.read_ahead, self.frame_count)
+        if not self.wanted <= self.reader.position <= end or self.wanted not in self.cache:
+            return self.wanted < self.frame_count and self.wanted not in self.unreadable
+        return self.reader.position < end
+
+    def close(self):
+        with self.changed:
+            self.stopped = True
+            self.changed.notify_all()
+        self.thread.join()
+        self.reader.close()
+
+
+class FrameArtist(artist.Artist):
+    '''Toont een frame van VideoSource (op schermgrootte, zie set_size) in het midden van een as, zonder te schalen'''
+
+    def __init__(self, ax):
+        super().__init__()
+        self.ax = ax
+        self.frame = None
+        self.set_figure(ax.figure)
+
+    def fit(self, width, height):
+        '''Grootte in pixels die in de as past met de verhouding width x height'''
+        scale = min(self.ax.bbox.width / width, self.ax.bbox.height / height)
+        return width * scale, height * scale
+
+    def set_frame(self, frame):
+        self.frame = frame
+        self.stale = True
+
+    @artist.allow_rasterization
+    def draw(self, renderer):
+        if not self.get_visible() or self.frame is None:
+            return
+        height, width = self.frame.shape[:2]
+        bbox = self.ax.bbox
+        gc = renderer.new_gc()
+        renderer.draw_image(gc, round(bbox.x0 + (bbox.width - width) / 2), round(bbox.y0 + (bbox.height - height) / 2), self.frame)
+        gc.restore()
+        self.stale = False
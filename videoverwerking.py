@@ -0,0 +1,275 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import cv2 as cv
+import videoindex
+
+
+class Transform:
+    '''Stap in de pipeline: bewerkt een batch frames (aantal x hoogte x breedte [x kanalen]) en geeft die terug
+
+    Stappen die een nieuwe array maken schrijven in een vooraf gereserveerde array per buffer van de pipeline (slot),
+    zodat er per batch niets nieuws gemaakt hoeft te worden. Stappen met verschillende slots lopen tegelijk.
+    '''
+
+    def __init__(self):
+        self.buffers = {}
+
+    def buffer(self, slot, shape, dtype=np.uint8):
+        '''Uitvoer-array voor deze batch (hergebruikt voor elke batch in hetzelfde slot)'''
+        array = self.buffers.get(slot)
+        if array is None or array.shape[1:] != shape[1:] or len(array) < shape[0]:
+            array = self.buffers[slot] = np.empty(shape, dtype)
+        return array[:shape[0]]
+
+    def __call__(self, frames, times, slot):
+        return frames
+
+
+class Grayscale(Transform):
+    '''BGR -> grijswaarden, voor de hele batch in één keer (de frames onder elkaar als één groot beeld)'''
+
+    def __call__(self, frames, times, slot):
+        n, height, width = frames.shape[:3]
+        output = self.buffer(slot, (n, height, width))
+        if n > 0:
+            cv.cvtColor(np.ascontiguousarray(frames).reshape(n * height, width, 3), cv.COLOR_BGR2GRAY,
+                        dst=output.reshape(n * height, width))
+        return output
+
+
+class Resize(Transform):
+    '''Naar width x height pixels (height None: zelfde verhouding als het origineel)'''
+
+    def __init__(self, width, height=None, interpolation=cv.INTER_AREA):
+        super().__init__()
+        self.width = width
+        self.height = height
+        self.interpolation = interpolation
+
+    def __call__(self, frames, times, slot):
+        width = self.width
+        height = self.height if self.height is not None else max(round(frames.shape[1] * width / frames.shape[2]), 1)
+        output = self.buffer(slot, (len(frames), height, width) + frames.shape[3:])
+        for frame, resized in zip(frames, output):
+            cv.resize(frame, (width, height), dst=resized, interpolation=self.interpolation)
+        return output
+
+
+class Crop(Transform):
+    '''Alleen het stuk van (x, y) met width x height pixels (een view, er wordt niets gekopieerd)'''
+
+    def __init__(self, x, y, width, height):
+        super().__init__()
+        self.x, self.y, self.width, self.height = x, y, width, height
+
+    def __call__(self, frames, times, slot):
+        return frames[:, self.y:self.y + self.height, self.x:self.x + self.width]
+
+
+class Timestamp(Transform):
+    '''Sessietijd (minuten:seconden) linksboven in elk frame'''
+
+    def __init__(self, position=(10, 30), scale=0.8, color=(255, 255, 255), thickness=2):
+        super().__init__()
+        self.position = position
+        self.scale = scale
+        self.color = color
+        self.thickness = thickness
+
+    def __call__(self, frames, times, slot):
+        color = self.color if frames.ndim == 4 else max(self.color)
+        for frame, t in zip(frames, times):
+            text = f'{int(t // 60):02d}:{t % 60:04.1f}'
+            cv.putText(frame, text, self.position, cv.FONT_HERSHEY_SIMPLEX, self.scale, color, self.thickness, cv.LINE_AA)
+        return frames
+
+
+class ArrayOutput:
+    '''Bewaart de bewerkte frames in één array (frames) met de sessietijden (times)'''
+
+    def __init__(self):
+        self.data = None
+        self.stamps = np.empty(0)
+        self.n = 0
+
+    @property
+    def frames(self):
+        return self.data[:self.n] if self.data is not None else np.empty((0, 0, 0), np.uint8)
+
+    @property
+    def times(self):
+        return self.stamps[:self.n]
+
+    def write(self, frames, times):
+        if self.data is None or self.n + len(frames) > len(self.data):
+            # Vol: twee keer zo groot maken (gemiddeld dus maar één keer kopiëren per frame)
+            capacity = max(2 * self.n, self.n + len(frames), 64)
+            data = np.empty((capacity,) + frames.shape[1:], frames.dtype)
+            stamps = np.empty(capacity)
+            if self.data is not None:
+                data[:self.n] = self.data[:self.n]
+                stamps[:self.n] = self.stamps[:self.n]
+            self.data, self.stamps = data, stamps
+        self.data[self.n:self.n + len(frames)] = frames
+        self.stamps[self.n:self.n + len(frames)] = times
+        self.n += len(frames)
+
+    def close(self):
+        pass
+
+
+class FileOutput:
+    '''Schrijft de bewerkte frames naar een video, met de tijden erbij (videoindex), zodat die gelijk blijft met de data
+
+    fps: van het nieuwe bestand; None = gemeten uit de tijden van de eerste batch (zoals de Recorder dat doet).
+    '''
+
+    def __init__(self, filename, fps=None, fourcc='MJPG'):
+        self.filename = filename
+        self.fps = fps
+        self.fourcc = fourcc
+        self.writer = None
+        self.written = 0
+        self.times = open(videoindex.times_file(filename), 'w')
+        self.times.write('Frame\tTime\tClock\n')
+
+    def write(self, frames, times):
+        if len(frames) == 0:
+            return
+        if self.writer is None:
+            if self.fps is None:
+                steps = np.diff(times)
+                self.fps = 1 / np.median(steps) if len(steps) > 0 and np.median(steps) > 0 else 25
+            height, width = frames.shape[1:3]
+            self.writer = cv.VideoWriter(str(self.filename), cv.VideoWriter_fourcc(*self.fourcc), self.fps, (width, height),
+                                         isColor=frames.ndim == 4)
+        for frame, t in zip(frames, times):
+            self.writer.write(np.ascontiguousarray(frame))
+            self.times.write(f'{self.written}\t{t:.6f}\tnan\n')
+            self.written += 1
+
+    def close(self):
+        self.times.close()
+        if self.writer is not None:
+            self.writer.release()
+            videoindex.build(self.filename)
+
+
+class DisplayOutput:
+    '''Toont de bewerkte frames in een venster (OpenCV); q stopt de pipeline'''
+
+    def __init__(self, name='frame', delay=1):
+        self.name = name
+        self.delay = delay
+
+    def write(self, frames, times):
+        for frame in frames:
+            cv.imshow(self.name, frame)
+            if cv.waitKey(self.delay) == ord('q'):
+                return False
+
+    def close(self):
+        cv.destroyWindow(self.name)
+
+
+class Pipeline:
+    '''Verwerkt een (opgenomen) video: lezen in batches, bewerken in een pool van threads, en naar een of meer uitvoeren
+
+    Een eigen thread leest de frames (via de index, zodat start/end direct gezocht worden) in vooraf gereserveerde
+    buffers van batch_size frames; elke batch gaat door de transforms in een thread van de pool (OpenCV geeft de GIL
+    vrij, dus lezen, bewerken en wegschrijven lopen echt tegelijk). De uitvoeren krijgen de batches op volgorde, in de
+    thread die run() aanroept (nodig voor het venster van DisplayOutput). Een uitvoer die False teruggeeft stopt het geheel.
+    Een buffer wordt pas opnieuw gevuld als de uitvoeren klaar zijn met de batch erin, dus het geheugen blijft begrensd
+    op (workers + 2) buffers.
+    '''
+
+    def __init__(self, video_file, transforms=(), outputs=(), batch_size=32, workers=None, offset=0):
+        self.video_file = video_file
+        self.transforms = list(transforms)
+        self.outputs = list(outputs)
+        self.batch_size = batch_size
+        self.workers = workers or os.cpu_count() or 1
+        self.offset = offset
+
+    def _process(self, frames, times, slot):
+        for transform in self.transforms:
+            frames = transform(frames, times, slot)
+        return frames, times
+
+    def run(self, start=None, end=None):
+        '''Verwerk de frames van sessietijd start tot end (None = begin/einde van de video); geeft de doorvoer terug'''
+        reader = videoindex.FrameReader(self.video_file, self.offset)
+        index = reader.index
+        first = 0 if start is None else max(index.frame(start), 0)
+        last = len(index) if end is None else min(index.frame(end) + 1, len(index))
+        height = int(reader.capture.get(cv.CAP_PROP_FRAME_HEIGHT))
+        width = int(reader.capture.get(cv.CAP_PROP_FRAME_WIDTH))
+        slots = [np.empty((self.batch_size, height, width, 3), np.uint8) for _ in range(self.workers + 2)]
+        free = queue.Queue() # Slots die (opnieuw) gevuld mogen worden
+        for slot in range(len(slots)):
+            free.put(slot)
+        batches = queue.Queue() # (future, slot) op volgorde; None = klaar met lezen
+        stopped = threading.Event()
+        errors = []
+        read_seconds = 0.0 # Tijd voor het lezen/decoderen (in de eigen thread)
+
+        def read(pool):
+            '''Thread: batches lezen in vrije slots en aan de pool geven'''
+            nonlocal read_seconds
+            try:
+                position = first
+                if first < last:
+                    reader.seek(first)
+                while position < last and not stopped.is_set():
+                    slot = free.get()
+                    if stopped.is_set():
+                        break
+                    buffer = slots[slot]
+                    wanted = min(self.batch_size, last - position)
+                    before = time.perf_counter()
+                    n = 0
+                    while n < wanted and reader.read(buffer[n]) is not None:
+                        n += 1
+                    read_seconds += time.perf_counter() - before
+                    times = index.offset + index.times[position:position + n]
+                    batches.put((pool.submit(self._process, buffer[:n], times, slot), slot))
+                    position += n
+                    if n < wanted:
+                        break # Einde van het bestand eerder dan de index zegt
+            except Exception as error:
+                errors.append(error)
+            finally:
+                batches.put(None)
+
+        frames = 0
+        started = time.perf_counter()
+        with ThreadPoolExecutor(self.workers) as pool:
+            thread = threading.Thread(target=read, args=(pool,), daemon=True)
+            thread.start()
+            while True:
+                item = batches.get()
+                if item is None:
+                    break
+                future, slot = item
+                batch, times = future.result()
+                if not stopped.is_set():
+                    for output in self.outputs:
+                        if output.write(batch, times) is False:
+                            stopped.set()
+                    frames += len(batch)
+                free.put(slot) # Klaar met deze batch: de buffer mag weer gevuld worden
+            thread.join()
+        for output in self.outputs:
+            output.close()
+        reader.close()
+        if errors:
+            raise errors[0]
+        seconds = time.perf_counter() - started
+        video_seconds = float(index.times[first + frames - 1] - index.times[first]) if frames > 1 else 0.0
+        return {'frames': frames, 'seconds': seconds, 'fps': frames / seconds if seconds > 0 else 0.0,
+                'read_fps': frames / read_seconds if read_seconds > 0 else 0.0,
+                'realtime': video_seconds / seconds if seconds > 0 else 0.0}
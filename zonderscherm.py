@@ -0,0 +1,86 @@
+import time
+from pathlib import Path
+import numpy as np
+import matplotlib.image as mimage
+from matplotlib.backend_bases import ResizeEvent
+
+
+class Offscreen:
+    '''Dashboard zonder venster (Agg): frames als NumPy array, PNG of ruwe RGBA bytes, met een vaste snelheid
+
+    Tekent in de buffer van de Agg renderer; die wordt steeds hergebruikt zolang de grootte gelijk blijft. Elk frame is
+    een gewone tick van de Scheduler (alleen wat veranderd is wordt opnieuw getekend), dus precies hetzelfde als op het
+    scherm, maar zonder Tk. Bruikbaar op een server of embedded systeem, voor een viewer op afstand en om te benchmarken.
+    '''
+
+    def __init__(self, fig, scheduler, rate=25):
+        self.fig = fig
+        self.canvas = fig.canvas
+        self.scheduler = scheduler
+        self.rate = rate # Frames per seconde
+        self.count = 0 # Aantal geleverde frames
+        self.late = 0 # Aantal frames dat niet op tijd klaar was
+
+    def start(self, width=2560, height=1440):
+        '''Zet de figure op een grootte in pixels en teken één keer volledig (achtergrond voor het blitten)'''
+        self.fig.set_size_inches(width / self.fig.dpi, height / self.fig.dpi)
+        # Zelfde event als bij een venster dat van grootte verandert (indeling en bewaarde achtergronden bijwerken)
+        ResizeEvent('resize_event', self.canvas)._process()
+        self.canvas.draw()
+
+    @property
+    def buffer(self):
+        '''De RGBA buffer van de renderer (hoogte x breedte x 4, uint8); geen kopie, dus verandert bij het volgende frame'''
+        return np.asarray(self.canvas.buffer_rgba())
+
+    def frame(self, out=None):
+        '''Teken het volgende frame; geeft de buffer terug, of kopieert die naar out (een eigen array van dezelfde vorm)'''
+        self.scheduler.tick()
+        self.count += 1
+        if out is None:
+            return self.buffer
+        np.copyto(out, self.buffer)
+        return out
+
+    def save_png(self, filename):
+        '''Huidige frame opslaan als PNG'''
+        mimage.imsave(filename, self.buffer)
+
+    def run(self, output=None, duration=None, frames=None, callback=None):
+        '''Lever frames met self.rate per seconde, tot duration seconden of frames frames voorbij zijn (of tot Ctrl+C)
+
+        output: map voor PNG bestanden (frame_000000.png, ...), of een .rgba bestand waar alle frames ruw achter elkaar
+        in komen; callback(frame, nummer) krijgt elk frame als array (bijv. om te versturen naar een viewer op afstand).
+        '''
+        raw = None
+        if output is not None and str(output).endswith('.rgba'):
+            raw = open(output, 'wb')
+        elif output is not None:
+            Path(output).mkdir(parents=True, exist_ok=True)
+        interval = 1 / self.rate
+        started = time.perf_counter()
+        next_frame = started
+        try:
+            while (duration is None or time.perf_counter() - started < duration) and (frames is None or self.count < frames):
+                frame = self.frame()
+                if raw is not None:
+                    raw.write(frame.tobytes())
+                elif output is not None:
+                    self.save_png(Path(output) / f'frame_{self.count - 1:06d}.png')
+                if callback is not None:
+                    callback(frame, self.count - 1)
+                next_frame += interval
+                delay = next_frame - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    # Niet op tijd; niet proberen in te halen
+                    self.late += 1
+                    next_frame = time.perf_counter()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if raw is not None:
+                raw.close()
+        height, width = self.buffer.shape[:2]
+        return {'frames': self.count, 'late': self.late, 'width': width, 'height': height, 'seconds': time.perf_counter() - started}